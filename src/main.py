@@ -6,12 +6,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
 from src.models.user_simple import db
+from src.utils.json_response import OrjsonProvider
 from src.routes.auth_simple import auth_bp
-from src.routes.business_no_auth import business_bp
 from src.routes.audience_simple import audience_bp
 from src.routes.payment_simple import payment_bp
 from src.routes.ai_conversations import ai_conversations_bp
@@ -22,6 +24,14 @@ load_dotenv()
 
 def create_app():
     app = Flask(__name__)
+    # Number of reverse proxies in front of the app whose X-Forwarded-For entry is
+    # trusted for request.remote_addr; 0 uses the direct peer address
+    trusted_proxies = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+    app.json = OrjsonProvider(app)
+    app.json.sort_keys = False
+    app.json.compact = True
     
     # Configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -29,11 +39,18 @@ def create_app():
     # Use persistent SQLite database for deployment
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///cognitive_persuasion.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'query_cache_size': 1200}
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    # 'none' serves the open /api/businesses routes; 'jwt' requires a signed-in user
+    app.config['AUTH_MODE'] = os.getenv('AUTH_MODE', 'none')
     
     # Initialize extensions
     db.init_app(app)
+    Compress(app)
     jwt = JWTManager(app)
     
     # Enhanced CORS configuration
@@ -86,6 +103,12 @@ def create_app():
             }
         })
     
+    # Only the business blueprint for the configured auth mode is imported
+    if app.config['AUTH_MODE'] == 'none':
+        from src.routes.business_no_auth import business_bp
+    else:
+        from src.routes.business_simple import business_bp
+    
     # Register blueprints - ALL INSIDE THE FUNCTION
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(business_bp, url_prefix='/api/businesses')
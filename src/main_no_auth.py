@@ -3,14 +3,16 @@ import sys
 from datetime import timedelta
 import hashlib
 import time
-from flask import Flask, send_from_directory, jsonify, request
+from flask import Flask, send_from_directory, jsonify, request, g
 from flask_cors import CORS
+from flask_compress import Compress
 from dotenv import load_dotenv
 
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from src.models.user_simple import db
+from src.utils.json_response import OrjsonProvider
 from src.routes.business_no_auth import business_bp
 from src.routes.audience_no_auth import audience_bp
 from src.routes.payment_simple import payment_bp
@@ -22,6 +24,9 @@ load_dotenv()
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    app.json.sort_keys = False
+    app.json.compact = True
     
     # Configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -29,6 +34,9 @@ def create_app():
     # Use persistent SQLite database for deployment
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///cognitive_persuasion.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'query_cache_size': 1200}
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
     
     # API Keys Configuration
     app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY', '')
@@ -43,6 +51,7 @@ def create_app():
     
     # Initialize extensions
     db.init_app(app)
+    Compress(app)
     
     # Enhanced CORS configuration
     CORS(app, 
@@ -67,10 +76,11 @@ def create_app():
         fingerprint_data = f"{user_agent}|{accept_language}|{accept_encoding}|{ip_address}"
         fingerprint = hashlib.sha256(fingerprint_data.encode()).hexdigest()[:16]
         
-        # Store in request context
+        # Store in request context; g.session_id is the owner key the no-auth routes use
         request.ip_address = ip_address
         request.fingerprint = fingerprint
         request.timestamp = int(time.time())
+        g.session_id = fingerprint
     
     # Health check endpoint
     @app.route('/api/health')
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from datetime import datetime, timezone
 import hashlib
 import uuid as python_uuid
@@ -17,6 +18,7 @@ def check_password(password, hashed):
 
 class SessionStatus(Enum):
     PENDING = "pending"
+    ACTIVE = "active"
     COMPLETED = "completed"
     FAILED = "failed"
 
@@ -66,6 +68,21 @@ class User(db.Model):
 
 class BusinessType(db.Model):
     __tablename__ = 'business_types'
+    __table_args__ = (
+        # Duplicate-name checks; the unique index also backs the 409 on create
+        db.Index('ix_bt_user_name', 'user_id', 'name', unique=True),
+        # Trigram GIN indexes so the substring ILIKEs in business search avoid a sequential scan
+        db.Index(
+            'ix_bt_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+        db.Index(
+            'ix_bt_industry_trgm', 'industry_category',
+            postgresql_using='gin',
+            postgresql_ops={'industry_category': 'gin_trgm_ops'}
+        ),
+    )
     
     business_type_id = db.Column(db.String(36), primary_key=True, default=lambda: str(python_uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=True)
@@ -75,6 +92,9 @@ class BusinessType(db.Model):
     is_custom = db.Column(db.Boolean, default=True)  # True for user-created, False for predefined
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
+    # Relationships
+    ai_sessions = db.relationship('AISession', backref='business_type', lazy=True)
+    
     def to_dict(self):
         return {
             'business_type_id': self.business_type_id,
@@ -88,6 +108,17 @@ class BusinessType(db.Model):
 
 class TargetAudience(db.Model):
     __tablename__ = 'target_audiences'
+    __table_args__ = (
+        # Names are unique per user regardless of case; the index also backs the 409 on create
+        db.Index('ix_ta_user_lname', 'user_id', db.text('lower(name)'), unique=True),
+        db.Index('ix_ta_user_custom', 'user_id', 'is_custom'),
+        # Trigram GIN index so the substring ILIKE in audience search avoids a sequential scan
+        db.Index(
+            'ix_ta_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+    )
     
     audience_id = db.Column(db.String(36), primary_key=True, default=lambda: str(python_uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=True)
@@ -97,6 +128,9 @@ class TargetAudience(db.Model):
     is_custom = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
+    # Relationships
+    ai_sessions = db.relationship('AISession', backref='target_audience', lazy=True)
+    
     def to_dict(self):
         return {
             'audience_id': self.audience_id,
@@ -108,8 +142,30 @@ class TargetAudience(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# gin_trgm_ops needs pg_trgm; make sure it exists before either table and its indexes are created
+for _trgm_table in (BusinessType.__table__, TargetAudience.__table__):
+    event.listen(
+        _trgm_table,
+        'before_create',
+        DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+    )
+
+# create_all does not alter an existing ai_sessions table. PostgreSQL databases
+# created before SessionStatus.ACTIVE and the JSON/regeneration columns need,
+# once (the enum stores member names):
+#   ALTER TYPE sessionstatus ADD VALUE IF NOT EXISTS 'ACTIVE';
+#   ALTER TABLE ai_sessions
+#       ADD COLUMN IF NOT EXISTS ai_responses JSON,
+#       ADD COLUMN IF NOT EXISTS session_metadata JSON,
+#       ADD COLUMN IF NOT EXISTS regeneration_count INTEGER DEFAULT 0,
+#       ADD COLUMN IF NOT EXISTS last_regenerated_at TIMESTAMP WITH TIME ZONE;
 class AISession(db.Model):
     __tablename__ = 'ai_sessions'
+    __table_args__ = (
+        # Session listings filter by user and page newest-first; stats group by status
+        db.Index('ix_ai_session_user_created', 'user_id', db.text('created_at DESC')),
+        db.Index('ix_ai_session_user_status', 'user_id', 'status'),
+    )
     
     session_id = db.Column(db.String(36), primary_key=True, default=lambda: str(python_uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
@@ -118,14 +174,19 @@ class AISession(db.Model):
     mission_objective = db.Column(db.Text, nullable=False)
     status = db.Column(db.Enum(SessionStatus), default=SessionStatus.PENDING)
     credits_consumed = db.Column(db.Integer, default=0)
+    ai_responses = db.Column(db.JSON)  # Generated agent responses
+    session_metadata = db.Column(db.JSON)  # Model used, generation context, etc.
+    regeneration_count = db.Column(db.Integer, default=0)
+    last_regenerated_at = db.Column(db.DateTime(timezone=True))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     completed_at = db.Column(db.DateTime)
     
     # Relationships
     messages = db.relationship('AIMessage', backref='session', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, light=True):
+        """Serialize the session; light omits the large JSON columns deferred on list queries"""
+        data = {
             'session_id': self.session_id,
             'user_id': self.user_id,
             'business_type_id': self.business_type_id,
@@ -133,9 +194,15 @@ class AISession(db.Model):
             'mission_objective': self.mission_objective,
             'status': self.status.value if self.status else None,
             'credits_consumed': self.credits_consumed,
+            'regeneration_count': self.regeneration_count or 0,
+            'last_regenerated_at': self.last_regenerated_at.isoformat() if self.last_regenerated_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
+        if not light:
+            data['ai_responses'] = self.ai_responses
+            data['session_metadata'] = self.session_metadata
+        return data
 
 class AIMessage(db.Model):
     __tablename__ = 'ai_messages'
@@ -185,3 +252,33 @@ class CreditTransaction(db.Model):
             'metadata': self.transaction_metadata
         }
 
+
+def get_business_and_audience(business_type_id, audience_id):
+    """Load a business type and target audience in a single round-trip.
+
+    Returns a (business_type, target_audience) tuple; either may be None.
+    """
+    row = db.session.execute(
+        db.select(BusinessType, TargetAudience).where(
+            BusinessType.business_type_id == business_type_id,
+            TargetAudience.audience_id == audience_id
+        )
+    ).first()
+    if row:
+        return row[0], row[1]
+    # At least one is missing; resolve which one for the caller's error message
+    return db.session.get(BusinessType, business_type_id), db.session.get(TargetAudience, audience_id)
+
+def deduct_credits(user_id, amount):
+    """Atomically deduct credits from a user's balance.
+
+    The balance check and the decrement happen in one UPDATE, so concurrent
+    requests cannot overspend. Returns the remaining balance, or None if the
+    balance does not cover the amount. The caller owns the transaction.
+    """
+    return db.session.execute(
+        db.update(User)
+        .where(User.user_id == user_id, User.credit_balance >= amount)
+        .values(credit_balance=User.credit_balance - amount)
+        .returning(User.credit_balance)
+    ).scalar()
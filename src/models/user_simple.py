@@ -1,10 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timezone
 import hashlib
 import uuid as python_uuid
 from enum import Enum
 
-db = SQLAlchemy()
+# Sessions are request-scoped, so objects returned from a commit do not need reloading
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
 # Simple password hashing without bcrypt
 def hash_password(password):
@@ -37,7 +37,9 @@ class User(db.Model):
     user_id = db.Column(db.String(36), primary_key=True, default=lambda: str(python_uuid.uuid4()))
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(128), nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # created_at columns send now() with each INSERT as well, since tables created
+    # before server_default was added have no column default
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), server_default=db.func.now())
     last_login = db.Column(db.DateTime)
     credit_balance = db.Column(db.Integer, default=0)  # Credits available
     
@@ -66,6 +68,18 @@ class User(db.Model):
 
 class BusinessType(db.Model):
     __tablename__ = 'business_types'
+    __table_args__ = (
+        # Duplicate-name checks; the unique index also backs the 409 on create
+        db.Index('ix_bt_user_name', 'user_id', 'name', unique=True),
+        # NULLs never collide in ix_bt_user_name, so shared rows (predefined and no-auth
+        # creations) get their own partial unique index on name
+        db.Index(
+            'ix_bt_shared_name', 'name',
+            unique=True,
+            postgresql_where=db.text('user_id IS NULL'),
+            sqlite_where=db.text('user_id IS NULL')
+        ),
+    )
     
     business_type_id = db.Column(db.String(36), primary_key=True, default=lambda: str(python_uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=True)
@@ -73,7 +87,7 @@ class BusinessType(db.Model):
     description = db.Column(db.Text)
     industry_category = db.Column(db.String(255))
     is_custom = db.Column(db.Boolean, default=True)  # True for user-created, False for predefined
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), server_default=db.func.now())
     
     def to_dict(self):
         return {
@@ -88,6 +102,11 @@ class BusinessType(db.Model):
 
 class TargetAudience(db.Model):
     __tablename__ = 'target_audiences'
+    __table_args__ = (
+        # Names are unique per user regardless of case; the index also backs the 409 on create
+        db.Index('ix_ta_user_lname', 'user_id', db.text('lower(name)'), unique=True),
+        db.Index('ix_ta_user_custom', 'user_id', 'is_custom'),
+    )
     
     audience_id = db.Column(db.String(36), primary_key=True, default=lambda: str(python_uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=True)
@@ -95,7 +114,7 @@ class TargetAudience(db.Model):
     description = db.Column(db.Text)
     manual_description = db.Column(db.Text)  # For manual audience input
     is_custom = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), server_default=db.func.now())
     
     def to_dict(self):
         return {
@@ -118,7 +137,7 @@ class AISession(db.Model):
     mission_objective = db.Column(db.Text, nullable=False)
     status = db.Column(db.Enum(SessionStatus), default=SessionStatus.PENDING)
     credits_consumed = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), server_default=db.func.now())
     completed_at = db.Column(db.DateTime)
     
     # Relationships
@@ -144,7 +163,7 @@ class AIMessage(db.Model):
     session_id = db.Column(db.String(36), db.ForeignKey('ai_sessions.session_id'), nullable=False)
     agent_type = db.Column(db.String(50), nullable=False)  # logic, emotion, creative, authority, social_proof
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), server_default=db.func.now())
     
     def to_dict(self):
         return {
@@ -165,7 +184,7 @@ class CreditTransaction(db.Model):
     price = db.Column(db.Numeric(10, 2))  # Price in USD for purchases
     status = db.Column(db.Enum(TransactionStatus), default=TransactionStatus.PENDING)
     paypal_order_id = db.Column(db.String(255))  # PayPal order ID
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), server_default=db.func.now())
     completed_at = db.Column(db.DateTime)
     
     # Additional metadata for transaction details
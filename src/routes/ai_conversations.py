@@ -14,13 +14,16 @@ from typing import Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import HTTPException
 import openai
 import anthropic
 import google.generativeai as genai
 import requests
 import os
 
+from utils.json_response import ojson, stream_json_list
+
 # Create blueprint
 ai_conversations_bp = Blueprint('ai_conversations', __name__)
 
@@ -610,17 +613,19 @@ class RefinedAIConversationEngine:
     
     def get_live_messages(self, conversation_id: str) -> List[Dict]:
         """Get conversation messages"""
-        messages = self.conversation_history.get(conversation_id, [])
-        return [
-            {
+        return list(self.iter_live_messages(conversation_id))
+    
+    def iter_live_messages(self, conversation_id: str):
+        """Yield conversation messages one at a time from a snapshot of the history"""
+        messages = list(self.conversation_history.get(conversation_id, []))
+        for msg in messages:
+            yield {
                 "id": msg.id,
                 "agent_name": msg.agent_name,
                 "content": msg.content,
                 "timestamp": msg.timestamp.isoformat(),
                 "round_number": msg.round_number
             }
-            for msg in messages
-        ]
     
     def get_public_conversations(self) -> List[Dict]:
         """Get all public conversations"""
@@ -644,6 +649,14 @@ class RefinedAIConversationEngine:
 conversation_engine = RefinedAIConversationEngine()
 
 # Routes
+@ai_conversations_bp.errorhandler(Exception)
+def handle_error(e):
+    """Turn unexpected errors in any route into a JSON 500"""
+    if isinstance(e, HTTPException):
+        return e
+    current_app.logger.exception("AI conversation request failed")
+    return ojson({"error": str(e)}, 500)
+
 @ai_conversations_bp.route('/tiers', methods=['GET'])
 def get_analysis_tiers():
     """Get available analysis tiers"""
@@ -675,113 +688,104 @@ def get_analysis_tiers():
 @ai_conversations_bp.route('/start', methods=['POST'])
 def start_conversation():
     """Start tiered AI conversation"""
-    try:
-        data = request.json
-        business_id = data.get('business_id')
-        tier = data.get('tier', 'tier1')
-        email = data.get('email', '')
-        
-        if not business_id:
-            return jsonify({"error": "business_id is required"}), 400
-        
-        if tier not in ANALYSIS_TIERS:
-            return jsonify({"error": "Invalid tier"}), 400
+    data = request.json
+    business_id = data.get('business_id')
+    tier = data.get('tier', 'tier1')
+    email = data.get('email', '')
+    
+    if not business_id:
+        return jsonify({"error": "business_id is required"}), 400
+    
+    if tier not in ANALYSIS_TIERS:
+        return jsonify({"error": "Invalid tier"}), 400
+    
+    # Check if owner email gets free access
+    is_owner = email == OWNER_EMAIL
+    tier_config = ANALYSIS_TIERS[tier]
+    
+    if tier == 'tier1' or is_owner:
+        # Free access for tier1 or owner
+        from models.user_simple import BusinessType
+        business = BusinessType.query.filter_by(business_type_id=business_id).first()
+        
+        if not business:
+            return jsonify({"error": "Business not found"}), 404
+        
+        business_data = {
+            "business_type_id": business.business_type_id,
+            "name": business.name,
+            "description": business.description,
+            "industry_category": business.industry_category
+        }
         
-        # Check if owner email gets free access
-        is_owner = email == OWNER_EMAIL
-        tier_config = ANALYSIS_TIERS[tier]
+        conversation_id = conversation_engine.start_conversation(
+            business_data, 
+            tier=tier,
+            email=email
+        )
         
-        if tier == 'tier1' or is_owner:
-            # Free access for tier1 or owner
-            from models.user_simple import BusinessType
-            business = BusinessType.query.filter_by(business_type_id=business_id).first()
-            
-            if not business:
-                return jsonify({"error": "Business not found"}), 404
-            
-            business_data = {
-                "business_type_id": business.business_type_id,
-                "name": business.name,
-                "description": business.description,
-                "industry_category": business.industry_category
-            }
-            
-            conversation_id = conversation_engine.start_conversation(
-                business_data, 
-                tier=tier,
-                email=email
-            )
-            
-            return jsonify({
-                "conversation_id": conversation_id,
-                "status": "started",
-                "tier": tier,
-                "tier_name": tier_config["name"],
-                "business_name": business.name,
-                "free_access": is_owner or tier == 'tier1',
-                "estimated_duration": tier_config["duration_minutes"],
-                "total_messages": tier_config["messages"],
-                "is_public": True,
-                "includes_publishing": tier_config["includes_publishing"]
-            })
-        else:
-            # Require payment for premium tiers (tier2-tier6)
-            return jsonify({
-                "status": "payment_required",
-                "tier": tier,
-                "tier_name": tier_config["name"],
-                "price": tier_config["price"],
-                "message": f"Payment required for {tier_config['name']} tier"
-            }), 402
-            
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({
+            "conversation_id": conversation_id,
+            "status": "started",
+            "tier": tier,
+            "tier_name": tier_config["name"],
+            "business_name": business.name,
+            "free_access": is_owner or tier == 'tier1',
+            "estimated_duration": tier_config["duration_minutes"],
+            "total_messages": tier_config["messages"],
+            "is_public": True,
+            "includes_publishing": tier_config["includes_publishing"]
+        })
+    else:
+        # Require payment for premium tiers (tier2-tier6)
+        return jsonify({
+            "status": "payment_required",
+            "tier": tier,
+            "tier_name": tier_config["name"],
+            "price": tier_config["price"],
+            "message": f"Payment required for {tier_config['name']} tier"
+        }), 402
 
 @ai_conversations_bp.route('/<conversation_id>/status', methods=['GET'])
 def get_conversation_status(conversation_id):
     """Get conversation status"""
     status = conversation_engine.get_conversation_status(conversation_id)
-    return jsonify(status)
+    return ojson(status)
 
 @ai_conversations_bp.route('/<conversation_id>/messages', methods=['GET'])
 def get_conversation_messages(conversation_id):
     """Get conversation messages"""
-    messages = conversation_engine.get_live_messages(conversation_id)
-    return jsonify({"messages": messages})
+    messages = conversation_engine.iter_live_messages(conversation_id)
+    return stream_json_list("messages", messages)
 
 @ai_conversations_bp.route('/public', methods=['GET'])
 def get_public_conversations():
     """Get all public conversations"""
     conversations = conversation_engine.get_public_conversations()
-    return jsonify({"conversations": conversations})
+    return ojson({"conversations": conversations})
 
 @ai_conversations_bp.route('/<conversation_id>/control', methods=['POST'])
 def control_conversation(conversation_id):
     """Control conversation (pause/resume/stop)"""
-    try:
-        data = request.json
-        action = data.get('action')
-        
-        if conversation_id not in conversation_engine.active_conversations:
-            return jsonify({"error": "Conversation not found"}), 404
-        
-        conv = conversation_engine.active_conversations[conversation_id]
-        
-        if action == 'pause':
-            conv["state"] = ConversationState.PAUSED
-        elif action == 'resume':
-            conv["state"] = ConversationState.RUNNING
-        elif action == 'stop':
-            conv["state"] = ConversationState.STOPPED
-        else:
-            return jsonify({"error": "Invalid action"}), 400
-        
-        return jsonify({
-            "conversation_id": conversation_id,
-            "action": action,
-            "new_state": conv["state"].value
-        })
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
+    data = request.json
+    action = data.get('action')
+    
+    if conversation_id not in conversation_engine.active_conversations:
+        return jsonify({"error": "Conversation not found"}), 404
+    
+    conv = conversation_engine.active_conversations[conversation_id]
+    
+    if action == 'pause':
+        conv["state"] = ConversationState.PAUSED
+    elif action == 'resume':
+        conv["state"] = ConversationState.RUNNING
+    elif action == 'stop':
+        conv["state"] = ConversationState.STOPPED
+    else:
+        return jsonify({"error": "Invalid action"}), 400
+    
+    return jsonify({
+        "conversation_id": conversation_id,
+        "action": action,
+        "new_state": conv["state"].value
+    })
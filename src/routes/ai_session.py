@@ -1,74 +1,121 @@
-from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.user import db, User, BusinessType, TargetAudience, AISession, SessionStatus
-from utils.ai_service import AIService
+from flask import Blueprint, request, current_app, g
+from models.user import (
+    db, User, AISession, SessionStatus,
+    get_business_and_audience, deduct_credits
+)
+from utils.ai_service import get_ai_service
+from utils.json_response import ojson, raw_json
+from utils.jwt_cache import cached_jwt_identity
+from utils.generation_cache import (
+    CACHED_GENERATION_COST_FACTOR, generation_cache_key, get_cached_generation, cache_generation,
+    submit_generation
+)
 from datetime import datetime, timezone
 import uuid as python_uuid
+import orjson
 
 ai_session_bp = Blueprint('ai_session', __name__)
 
+# Namespace for this blueprint's entries in the shared generation cache
+_GENERATION_KIND = 'persuasion'
+
+_STATUS_MAP = {status.value: status for status in SessionStatus}
+
+# Endpoints in this blueprint that do not require a JWT
+_PUBLIC_ENDPOINTS = {'ai_session.get_available_models'}
+
+# Bodies for the common 4xx responses, encoded once at import
+_USER_NOT_FOUND = orjson.dumps({'message': 'User not found'})
+_SESSION_NOT_FOUND = orjson.dumps({'message': 'Session not found'})
+_INVALID_STATUS = orjson.dumps({'message': 'Invalid status'})
+_INVALID_STATUS_VALUE = orjson.dumps({'message': 'Invalid status value'})
+
+@ai_session_bp.before_request
+def _load_identity():
+    """Verify the JWT once per request and keep the caller's identity on flask.g"""
+    if request.endpoint in _PUBLIC_ENDPOINTS:
+        return
+    # None for exempt methods such as OPTIONS
+    user_id = cached_jwt_identity()
+    if user_id is not None:
+        g.user_id = user_id
+
 @ai_session_bp.route('/sessions', methods=['POST'])
-@jwt_required()
 def create_session():
     """Create a new AI persuasion session."""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        current_user_id = g.user_id
+        user = db.session.get(User, current_user_id)
         
         if not user:
-            return jsonify({'message': 'User not found'}), 404
+            return raw_json(_USER_NOT_FOUND, 404)
         
         data = request.get_json()
         if not data:
-            return jsonify({'message': 'No data provided'}), 400
+            return ojson({'message': 'No data provided'}, 400)
         
         # Validate required fields
         required_fields = ['business_type_id', 'audience_id', 'mission_objective']
         for field in required_fields:
             if not data.get(field):
-                return jsonify({'message': f'{field} is required'}), 400
+                return ojson({'message': f'{field} is required'}, 400)
         
         # Get business type and audience
-        business_type = BusinessType.query.get(data['business_type_id'])
-        target_audience = TargetAudience.query.get(data['audience_id'])
+        business_type, target_audience = get_business_and_audience(
+            data['business_type_id'], data['audience_id']
+        )
         
         if not business_type:
-            return jsonify({'message': 'Business type not found'}), 404
+            return ojson({'message': 'Business type not found'}, 404)
         
         if not target_audience:
-            return jsonify({'message': 'Target audience not found'}), 404
+            return ojson({'message': 'Target audience not found'}, 404)
         
-        # Initialize AI service
-        ai_service = AIService()
+        ai_service = get_ai_service()
+        business_type_dict = business_type.to_dict()
+        target_audience_dict = target_audience.to_dict()
         
         # Calculate credit cost
         session_data = {
             'mission_objective': data['mission_objective'],
-            'business_type': business_type.to_dict(),
-            'target_audience': target_audience.to_dict()
+            'business_type': business_type_dict,
+            'target_audience': target_audience_dict
         }
         credit_cost = ai_service.calculate_credit_cost(session_data)
         
+        # Identical requests reuse the cached generation at a reduced cost
+        cache_key = generation_cache_key(
+            _GENERATION_KIND, data['business_type_id'], data['audience_id'], data['mission_objective']
+        )
+        ai_responses = get_cached_generation(cache_key)
+        if ai_responses is not None:
+            credit_cost = round(credit_cost * CACHED_GENERATION_COST_FACTOR, 2)
+        
         # Check if user has enough credits
         if user.credit_balance < credit_cost:
-            return jsonify({
+            return ojson({
                 'message': 'Insufficient credits',
                 'required_credits': credit_cost,
                 'current_balance': float(user.credit_balance)
-            }), 402  # Payment Required
+            }, 402)  # Payment Required
         
-        # Generate AI responses
-        try:
-            ai_responses = ai_service.generate_persuasion_responses(
-                business_type=business_type.to_dict(),
-                target_audience=target_audience.to_dict(),
-                mission_objective=data['mission_objective']
-            )
-        except Exception as e:
-            return jsonify({
-                'message': f'AI generation failed: {str(e)}',
-                'fallback': 'Using template-based responses'
-            }), 500
+        # Generate AI responses; identical requests already in flight share one call
+        if ai_responses is None:
+            try:
+                ai_responses = submit_generation(
+                    cache_key,
+                    ai_service.generate_persuasion_responses,
+                    business_type_dict,
+                    target_audience_dict,
+                    data['mission_objective']
+                ).result()
+            except Exception as e:
+                return ojson({
+                    'message': f'AI generation failed: {str(e)}',
+                    'fallback': 'Using template-based responses'
+                }, 500)
+        
+        available_models = ai_service.get_available_models()
         
         # Create session record
         session = AISession(
@@ -80,64 +127,75 @@ def create_session():
             status=SessionStatus.ACTIVE,
             ai_responses=ai_responses,
             session_metadata={
-                'ai_model_used': ai_service.get_available_models()[0] if ai_service.get_available_models() else 'template',
+                'ai_model_used': available_models[0] if available_models else 'template',
                 'generation_timestamp': datetime.now(timezone.utc).isoformat(),
                 'business_context': business_type.name,
                 'audience_context': target_audience.name
             }
         )
         
-        # Deduct credits from user
-        user.deduct_credits(credit_cost)
+        # Deduct credits; the balance guard runs in the same UPDATE
+        remaining_balance = deduct_credits(current_user_id, credit_cost)
+        if remaining_balance is None:
+            db.session.rollback()
+            return ojson({
+                'message': 'Insufficient credits',
+                'required_credits': credit_cost,
+                'current_balance': float(user.credit_balance)
+            }, 402)
         
         # Save to database
         db.session.add(session)
         db.session.commit()
         
-        return jsonify({
+        return ojson({
             'message': 'AI session created successfully',
             'session': session.to_dict(),
             'ai_responses': ai_responses,
             'credits_consumed': credit_cost,
-            'remaining_balance': float(user.credit_balance)
-        }), 201
+            'remaining_balance': float(remaining_balance)
+        }, 201)
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create session: {str(e)}'}), 500
+        return ojson({'message': f'Failed to create session: {str(e)}'}, 500)
 
 @ai_session_bp.route('/sessions', methods=['GET'])
-@jwt_required()
 def get_sessions():
     """Get user's AI sessions."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         user = User.query.get(current_user_id)
         
         if not user:
-            return jsonify({'message': 'User not found'}), 404
+            return raw_json(_USER_NOT_FOUND, 404)
         
         # Get query parameters
         status = request.args.get('status')
         limit = request.args.get('limit', 10, type=int)
         offset = request.args.get('offset', 0, type=int)
+        include_total = request.args.get('include_total', '0') == '1'
         
         # Build query
-        query = AISession.query.filter_by(user_id=current_user_id)
+        filters = [AISession.user_id == current_user_id]
         
         if status:
-            try:
-                status_enum = SessionStatus(status)
-                query = query.filter_by(status=status_enum)
-            except ValueError:
-                return jsonify({'message': 'Invalid status'}), 400
-        
-        # Order by creation date (newest first)
-        query = query.order_by(AISession.created_at.desc())
-        
-        # Apply pagination
-        total = query.count()
-        sessions = query.offset(offset).limit(limit).all()
+            status_enum = _STATUS_MAP.get(status)
+            if status_enum is None:
+                return raw_json(_INVALID_STATUS, 400)
+            filters.append(AISession.status == status_enum)
+        
+        # Apply pagination; one extra row tells us whether another page exists
+        rows = db.session.scalars(
+            db.select(AISession)
+            .options(db.defer(AISession.ai_responses), db.defer(AISession.session_metadata))
+            .where(*filters)
+            .order_by(AISession.created_at.desc())  # Newest first
+            .offset(offset)
+            .limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        sessions = rows[:limit]
         
         # Include related data
         session_data = []
@@ -154,34 +212,42 @@ def get_sessions():
             
             session_data.append(session_dict)
         
-        return jsonify({
+        response = {
             'sessions': session_data,
-            'total': total,
             'limit': limit,
             'offset': offset,
-            'has_more': offset + len(sessions) < total
-        }), 200
+            'has_more': has_more
+        }
+        
+        # Counting is opt-in since infinite-scroll clients only need has_more
+        if include_total:
+            response['total'] = db.session.scalar(
+                db.select(db.func.count()).select_from(AISession).where(*filters)
+            )
+        
+        return ojson(response, 200)
         
     except Exception as e:
-        return jsonify({'message': f'Failed to get sessions: {str(e)}'}), 500
+        return ojson({'message': f'Failed to get sessions: {str(e)}'}, 500)
 
 @ai_session_bp.route('/sessions/<session_id>', methods=['GET'])
-@jwt_required()
 def get_session(session_id):
     """Get a specific AI session with full details."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         
-        session = AISession.query.filter_by(
-            session_id=session_id,
-            user_id=current_user_id
+        session = db.session.scalars(
+            db.select(AISession).where(
+                AISession.session_id == session_id,
+                AISession.user_id == current_user_id
+            )
         ).first()
         
         if not session:
-            return jsonify({'message': 'Session not found'}), 404
+            return raw_json(_SESSION_NOT_FOUND, 404)
         
         # Build detailed response
-        session_dict = session.to_dict()
+        session_dict = session.to_dict(light=False)
         
         # Add business type info
         if session.business_type:
@@ -191,27 +257,22 @@ def get_session(session_id):
         if session.target_audience:
             session_dict['target_audience'] = session.target_audience.to_dict()
         
-        # Add AI responses if available
-        if session.ai_responses:
-            session_dict['ai_responses'] = session.ai_responses
-        
-        return jsonify({
+        return ojson({
             'session': session_dict
-        }), 200
+        }, 200)
         
     except Exception as e:
-        return jsonify({'message': f'Failed to get session: {str(e)}'}), 500
+        return ojson({'message': f'Failed to get session: {str(e)}'}, 500)
 
 @ai_session_bp.route('/sessions/<session_id>/regenerate', methods=['POST'])
-@jwt_required()
 def regenerate_responses(session_id):
     """Regenerate AI responses for a session."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         user = User.query.get(current_user_id)
         
         if not user:
-            return jsonify({'message': 'User not found'}), 404
+            return raw_json(_USER_NOT_FOUND, 404)
         
         session = AISession.query.filter_by(
             session_id=session_id,
@@ -219,73 +280,90 @@ def regenerate_responses(session_id):
         ).first()
         
         if not session:
-            return jsonify({'message': 'Session not found'}), 404
+            return raw_json(_SESSION_NOT_FOUND, 404)
         
         # Calculate regeneration cost (50% of original cost)
-        ai_service = AIService()
+        ai_service = get_ai_service()
+        business_type_dict = session.business_type.to_dict() if session.business_type else {}
+        target_audience_dict = session.target_audience.to_dict() if session.target_audience else {}
         session_data = {
             'mission_objective': session.mission_objective,
-            'business_type': session.business_type.to_dict() if session.business_type else {},
-            'target_audience': session.target_audience.to_dict() if session.target_audience else {}
+            'business_type': business_type_dict,
+            'target_audience': target_audience_dict
         }
         regeneration_cost = ai_service.calculate_credit_cost(session_data) * 0.5
         
         # Check if user has enough credits
         if user.credit_balance < regeneration_cost:
-            return jsonify({
+            return ojson({
                 'message': 'Insufficient credits for regeneration',
                 'required_credits': regeneration_cost,
                 'current_balance': float(user.credit_balance)
-            }), 402
+            }, 402)
         
         # Generate new AI responses
         try:
             new_responses = ai_service.generate_persuasion_responses(
-                business_type=session.business_type.to_dict() if session.business_type else {},
-                target_audience=session.target_audience.to_dict() if session.target_audience else {},
+                business_type=business_type_dict,
+                target_audience=target_audience_dict,
                 mission_objective=session.mission_objective
             )
         except Exception as e:
-            return jsonify({
+            return ojson({
                 'message': f'AI regeneration failed: {str(e)}'
-            }), 500
+            }, 500)
+        
+        # Later identical requests should pick up the fresh responses
+        cache_generation(
+            generation_cache_key(
+                _GENERATION_KIND, session.business_type_id, session.audience_id, session.mission_objective
+            ),
+            new_responses
+        )
         
         # Update session
         session.ai_responses = new_responses
         session.credits_consumed += regeneration_cost
         session.message_count = (session.message_count or 0) + 1
-        
-        # Update metadata
-        if session.session_metadata:
-            session.session_metadata['last_regeneration'] = datetime.now(timezone.utc).isoformat()
-            session.session_metadata['total_regenerations'] = session.session_metadata.get('total_regenerations', 0) + 1
-        
-        # Deduct credits
-        user.deduct_credits(regeneration_cost)
+        session.regeneration_count = db.func.coalesce(AISession.regeneration_count, 0) + 1
+        session.last_regenerated_at = db.func.now()
+        
+        # Deduct credits; the balance guard runs in the same UPDATE
+        remaining_balance = deduct_credits(current_user_id, regeneration_cost)
+        if remaining_balance is None:
+            db.session.rollback()
+            return ojson({
+                'message': 'Insufficient credits for regeneration',
+                'required_credits': regeneration_cost,
+                'current_balance': float(user.credit_balance)
+            }, 402)
         
         db.session.commit()
         
-        return jsonify({
+        return ojson({
             'message': 'Responses regenerated successfully',
             'ai_responses': new_responses,
             'credits_consumed': regeneration_cost,
-            'remaining_balance': float(user.credit_balance)
-        }), 200
+            'remaining_balance': float(remaining_balance)
+        }, 200)
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': f'Failed to regenerate responses: {str(e)}'}), 500
+        return ojson({'message': f'Failed to regenerate responses: {str(e)}'}, 500)
 
 @ai_session_bp.route('/sessions/<session_id>/status', methods=['PUT'])
-@jwt_required()
 def update_session_status(session_id):
     """Update session status."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         
         data = request.get_json()
         if not data or 'status' not in data:
-            return jsonify({'message': 'Status is required'}), 400
+            return ojson({'message': 'Status is required'}, 400)
+        
+        new_status = _STATUS_MAP.get(data['status'])
+        if new_status is None:
+            return raw_json(_INVALID_STATUS_VALUE, 400)
         
         session = AISession.query.filter_by(
             session_id=session_id,
@@ -293,79 +371,71 @@ def update_session_status(session_id):
         ).first()
         
         if not session:
-            return jsonify({'message': 'Session not found'}), 404
+            return raw_json(_SESSION_NOT_FOUND, 404)
         
-        try:
-            new_status = SessionStatus(data['status'])
-            session.status = new_status
-            db.session.commit()
-            
-            return jsonify({
-                'message': 'Session status updated',
-                'session_id': session_id,
-                'new_status': new_status.value
-            }), 200
-            
-        except ValueError:
-            return jsonify({'message': 'Invalid status value'}), 400
+        session.status = new_status
+        db.session.commit()
+        
+        return ojson({
+            'message': 'Session status updated',
+            'session_id': session_id,
+            'new_status': new_status.value
+        }, 200)
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': f'Failed to update status: {str(e)}'}), 500
+        return ojson({'message': f'Failed to update status: {str(e)}'}, 500)
 
 @ai_session_bp.route('/sessions/stats', methods=['GET'])
-@jwt_required()
 def get_session_stats():
     """Get user's session statistics."""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Get session counts by status
-        total_sessions = AISession.query.filter_by(user_id=current_user_id).count()
-        active_sessions = AISession.query.filter_by(
-            user_id=current_user_id,
-            status=SessionStatus.ACTIVE
-        ).count()
-        completed_sessions = AISession.query.filter_by(
-            user_id=current_user_id,
-            status=SessionStatus.COMPLETED
-        ).count()
-        
-        # Get total credits consumed
-        total_credits_consumed = db.session.query(
-            db.func.sum(AISession.credits_consumed)
-        ).filter_by(user_id=current_user_id).scalar() or 0
+        current_user_id = g.user_id
+        
+        # Get session counts by status and total credits consumed in one pass
+        stats = db.session.execute(
+            db.select(
+                db.func.count().label('total'),
+                db.func.sum(db.case((AISession.status == SessionStatus.ACTIVE, 1), else_=0)).label('active'),
+                db.func.sum(db.case((AISession.status == SessionStatus.COMPLETED, 1), else_=0)).label('completed'),
+                db.func.coalesce(db.func.sum(AISession.credits_consumed), 0).label('credits')
+            ).where(AISession.user_id == current_user_id)
+        ).one()
         
         # Get recent activity
-        recent_sessions = AISession.query.filter_by(
-            user_id=current_user_id
-        ).order_by(AISession.created_at.desc()).limit(5).all()
-        
-        return jsonify({
+        recent_sessions = db.session.scalars(
+            db.select(AISession)
+            .options(db.defer(AISession.ai_responses), db.defer(AISession.session_metadata))
+            .where(AISession.user_id == current_user_id)
+            .order_by(AISession.created_at.desc())
+            .limit(5)
+        ).all()
+        
+        return ojson({
             'stats': {
-                'total_sessions': total_sessions,
-                'active_sessions': active_sessions,
-                'completed_sessions': completed_sessions,
-                'total_credits_consumed': float(total_credits_consumed)
+                'total_sessions': stats.total,
+                'active_sessions': stats.active or 0,
+                'completed_sessions': stats.completed or 0,
+                'total_credits_consumed': float(stats.credits)
             },
             'recent_activity': [session.to_dict() for session in recent_sessions]
-        }), 200
+        }, 200)
         
     except Exception as e:
-        return jsonify({'message': f'Failed to get stats: {str(e)}'}), 500
+        return ojson({'message': f'Failed to get stats: {str(e)}'}, 500)
 
 @ai_session_bp.route('/ai-models', methods=['GET'])
 def get_available_models():
     """Get list of available AI models."""
     try:
-        ai_service = AIService()
+        ai_service = get_ai_service()
         models = ai_service.get_available_models()
         
-        return jsonify({
+        return ojson({
             'models': models,
             'configured': ai_service.is_configured()
-        }), 200
+        }, 200)
         
     except Exception as e:
-        return jsonify({'message': f'Failed to get models: {str(e)}'}), 500
+        return ojson({'message': f'Failed to get models: {str(e)}'}, 500)
 
@@ -1,14 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import uuid as python_uuid
 import asyncio
+import uuid as python_uuid
 from datetime import datetime
 
-from models.user import db, User, BusinessType, TargetAudience, AISession, CreditTransaction
+from models.user import (
+    db, User, AISession, SessionStatus, CreditTransaction,
+    TransactionType, TransactionStatus, get_business_and_audience, deduct_credits
+)
 from utils.multi_ai_service import multi_ai_service
+from utils.json_response import ojson
+from utils.generation_cache import (
+    CACHED_GENERATION_COST_FACTOR, generation_cache_key, get_cached_generation, cache_generation,
+    submit_generation
+)
 
 ai_session_bp = Blueprint('ai_session_enhanced', __name__)
 
+# Namespace for this blueprint's entries in the shared generation cache
+_GENERATION_KIND = 'multi_agent'
+
+def _generate(business_dict, audience_dict, mission_objective):
+    """Run the multi-AI generation to completion on a worker thread"""
+    return asyncio.run(
+        multi_ai_service.generate_multi_agent_responses(business_dict, audience_dict, mission_objective)
+    )
+
 @ai_session_bp.route('/sessions', methods=['GET'])
 @jwt_required()
 def get_sessions():
@@ -16,19 +33,24 @@ def get_sessions():
     try:
         user_id = get_jwt_identity()
         
-        sessions = AISession.query.filter_by(user_id=user_id).order_by(AISession.created_at.desc()).all()
+        sessions = db.session.scalars(
+            db.select(AISession)
+            .options(db.defer(AISession.ai_responses), db.defer(AISession.session_metadata))
+            .where(AISession.user_id == user_id)
+            .order_by(AISession.created_at.desc())
+        ).all()
         
-        return jsonify({
+        return ojson({
             'success': True,
             'sessions': [session.to_dict() for session in sessions]
         })
         
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+        return ojson({'success': False, 'message': str(e)}, 500)
 
 @ai_session_bp.route('/sessions', methods=['POST'])
 @jwt_required()
-def create_session():
+async def create_session():
     """Create a new AI session with multi-AI provider responses"""
     try:
         user_id = get_jwt_identity()
@@ -38,133 +60,123 @@ def create_session():
         required_fields = ['business_type_id', 'audience_id', 'mission_objective']
         for field in required_fields:
             if not data.get(field):
-                return jsonify({'success': False, 'message': f'{field} is required'}), 400
+                return ojson({'success': False, 'message': f'{field} is required'}, 400)
+        
+        # Get business and audience details
+        business, audience = get_business_and_audience(
+            data['business_type_id'], data['audience_id']
+        )
+        
+        if not business:
+            return ojson({'success': False, 'message': 'Business type not found'}, 404)
+        if not audience:
+            return ojson({'success': False, 'message': 'Target audience not found'}, 404)
+        
+        # Session ID is needed up front for the transaction metadata; the row
+        # itself is only inserted once generation has succeeded
+        session_id = str(python_uuid.uuid4())
+        
+        # Convert SQLAlchemy objects to dicts for the AI service
+        business_dict = {
+            'name': business.name,
+            'description': business.description,
+            'industry_category': business.industry_category
+        }
+        
+        audience_dict = {
+            'name': audience.name,
+            'description': audience.description,
+            'manual_description': audience.manual_description
+        }
         
         # Verify user has sufficient credits
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
-            return jsonify({'success': False, 'message': 'User not found'}), 404
+            return ojson({'success': False, 'message': 'User not found'}, 404)
             
         # Estimate credit cost (5 agents = 5 credits minimum)
         estimated_cost = 5
-        if user.credits < estimated_cost:
-            return jsonify({
+        if user.credit_balance < estimated_cost:
+            return ojson({
                 'success': False, 
-                'message': f'Insufficient credits. Need {estimated_cost}, have {user.credits}'
-            }), 400
+                'message': f'Insufficient credits. Need {estimated_cost}, have {user.credit_balance}'
+            }, 400)
         
-        # Get business and audience details
-        business = BusinessType.query.get(data['business_type_id'])
-        audience = TargetAudience.query.get(data['audience_id'])
-        
-        if not business:
-            return jsonify({'success': False, 'message': 'Business type not found'}), 404
-        if not audience:
-            return jsonify({'success': False, 'message': 'Target audience not found'}), 404
+        # Reuse the cached result for identical requests, otherwise call multi-AI service
+        cache_key = generation_cache_key(
+            _GENERATION_KIND, data['business_type_id'], data['audience_id'], data['mission_objective']
+        )
+        ai_result = get_cached_generation(cache_key)
+        cost_factor = CACHED_GENERATION_COST_FACTOR
+        if ai_result is None:
+            # Identical requests already in flight share the same provider calls
+            generation = submit_generation(
+                cache_key, _generate, business_dict, audience_dict, data['mission_objective']
+            )
+            try:
+                # Shielded so one caller going away does not cancel a shared generation
+                ai_result = await asyncio.shield(asyncio.wrap_future(generation))
+            except Exception as ai_error:
+                return ojson({
+                    'success': False,
+                    'message': f'AI generation failed: {str(ai_error)}'
+                }, 500)
+            cost_factor = 1
+        
+        # Calculate actual credits consumed based on AI costs
+        actual_cost = max(5, int(ai_result['total_cost'] * 100 * cost_factor))  # Convert to credits (1 credit = $0.01)
+        
+        # Deduct credits; the balance guard runs in the same UPDATE
+        remaining_credits = deduct_credits(user_id, actual_cost)
+        if remaining_credits is None:
+            db.session.rollback()
+            return ojson({
+                'success': False,
+                'message': f'Insufficient credits. Actual cost: {actual_cost}, available: {user.credit_balance}'
+            }, 400)
         
-        # Create session record
-        session_id = str(python_uuid.uuid4())
+        # Insert the completed session and its credit transaction in one commit
         session = AISession(
             session_id=session_id,
             user_id=user_id,
             business_type_id=data['business_type_id'],
             audience_id=data['audience_id'],
             mission_objective=data['mission_objective'],
-            status='processing'
+            status=SessionStatus.COMPLETED,
+            ai_responses=ai_result['responses'],
+            credits_consumed=actual_cost,
+            completed_at=datetime.utcnow()
+        )
+        
+        transaction = CreditTransaction(
+            transaction_id=str(python_uuid.uuid4()),
+            user_id=user_id,
+            transaction_type=TransactionType.CONSUMPTION,
+            amount=-actual_cost,
+            status=TransactionStatus.COMPLETED,
+            transaction_metadata={
+                'description': f'AI Session: {session.mission_objective[:50]}...',
+                'session_id': session_id,
+                'ai_cost': ai_result['total_cost'],
+                'agents_used': list(ai_result['responses'].keys())
+            }
         )
         
         db.session.add(session)
+        db.session.add(transaction)
         db.session.commit()
         
-        # Generate AI responses using multiple providers
-        try:
-            # Convert SQLAlchemy objects to dicts for the AI service
-            business_dict = {
-                'name': business.name,
-                'description': business.description,
-                'industry_category': business.industry_category
-            }
-            
-            audience_dict = {
-                'name': audience.name,
-                'description': audience.description,
-                'manual_description': audience.manual_description
-            }
-            
-            # Call multi-AI service (run async function in sync context)
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            ai_result = loop.run_until_complete(
-                multi_ai_service.generate_multi_agent_responses(
-                    business_dict, 
-                    audience_dict, 
-                    data['mission_objective']
-                )
-            )
-            loop.close()
-            
-            # Calculate actual credits consumed based on AI costs
-            actual_cost = max(5, int(ai_result['total_cost'] * 100))  # Convert to credits (1 credit = $0.01)
-            
-            # Check if user still has enough credits after actual calculation
-            if user.credits < actual_cost:
-                session.status = 'failed'
-                session.error_message = f'Insufficient credits for actual cost: {actual_cost}'
-                db.session.commit()
-                return jsonify({
-                    'success': False,
-                    'message': f'Insufficient credits. Actual cost: {actual_cost}, available: {user.credits}'
-                }), 400
-            
-            # Deduct credits
-            user.credits -= actual_cost
-            
-            # Record credit transaction
-            transaction = CreditTransaction(
-                transaction_id=str(python_uuid.uuid4()),
-                user_id=user_id,
-                transaction_type='consumption',
-                amount=-actual_cost,
-                description=f'AI Session: {session.mission_objective[:50]}...',
-                transaction_metadata={
-                    'session_id': session_id,
-                    'ai_cost': ai_result['total_cost'],
-                    'agents_used': list(ai_result['responses'].keys())
-                }
-            )
-            
-            db.session.add(transaction)
-            
-            # Update session with results
-            session.ai_responses = ai_result['responses']
-            session.credits_consumed = actual_cost
-            session.status = 'completed'
-            session.completed_at = datetime.utcnow()
-            
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'session': session.to_dict(),
-                'ai_responses': ai_result['responses'],
-                'credits_consumed': actual_cost,
-                'remaining_credits': user.credits
-            })
-            
-        except Exception as ai_error:
-            # Handle AI generation errors
-            session.status = 'failed'
-            session.error_message = str(ai_error)
-            db.session.commit()
-            
-            return jsonify({
-                'success': False,
-                'message': f'AI generation failed: {str(ai_error)}'
-            }), 500
+        return ojson({
+            'success': True,
+            'session': session.to_dict(),
+            'ai_responses': ai_result['responses'],
+            'credits_consumed': actual_cost,
+            'remaining_credits': remaining_credits
+        })
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}), 500
+        return ojson({'success': False, 'message': str(e)}, 500)
 
 @ai_session_bp.route('/sessions/<session_id>', methods=['GET'])
 @jwt_required()
@@ -179,44 +191,45 @@ def get_session(session_id):
         ).first()
         
         if not session:
-            return jsonify({'success': False, 'message': 'Session not found'}), 404
+            return ojson({'success': False, 'message': 'Session not found'}, 404)
         
-        return jsonify({
+        return ojson({
             'success': True,
-            'session': session.to_dict()
+            'session': session.to_dict(light=False)
         })
         
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+        return ojson({'success': False, 'message': str(e)}, 500)
 
 @ai_session_bp.route('/sessions/<session_id>/regenerate', methods=['POST'])
 @jwt_required()
-def regenerate_responses(session_id):
+async def regenerate_responses(session_id):
     """Regenerate AI responses for a specific session"""
     try:
         user_id = get_jwt_identity()
         
-        session = AISession.query.filter_by(
-            session_id=session_id,
-            user_id=user_id
-        ).first()
+        # Business type and audience come along with the session
+        session = db.session.execute(
+            db.select(AISession)
+            .options(db.selectinload(AISession.business_type), db.selectinload(AISession.target_audience))
+            .where(AISession.session_id == session_id, AISession.user_id == user_id)
+        ).scalar_one_or_none()
         
         if not session:
-            return jsonify({'success': False, 'message': 'Session not found'}), 404
+            return ojson({'success': False, 'message': 'Session not found'}, 404)
         
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         
         # Estimate cost for regeneration
         estimated_cost = 5
-        if user.credits < estimated_cost:
-            return jsonify({
+        if user.credit_balance < estimated_cost:
+            return ojson({
                 'success': False,
-                'message': f'Insufficient credits for regeneration. Need {estimated_cost}, have {user.credits}'
-            }), 400
+                'message': f'Insufficient credits for regeneration. Need {estimated_cost}, have {user.credit_balance}'
+            }, 400)
         
-        # Get business and audience details
-        business = BusinessType.query.get(session.business_type_id)
-        audience = TargetAudience.query.get(session.audience_id)
+        business = session.business_type
+        audience = session.target_audience
         
         # Regenerate responses
         business_dict = {
@@ -232,37 +245,39 @@ def regenerate_responses(session_id):
         }
         
         # Call multi-AI service
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        ai_result = loop.run_until_complete(
-            multi_ai_service.generate_multi_agent_responses(
-                business_dict,
-                audience_dict,
-                session.mission_objective
-            )
+        ai_result = await multi_ai_service.generate_multi_agent_responses(
+            business_dict,
+            audience_dict,
+            session.mission_objective
+        )
+        cache_generation(
+            generation_cache_key(
+                _GENERATION_KIND, session.business_type_id, session.audience_id, session.mission_objective
+            ),
+            ai_result
         )
-        loop.close()
         
         # Calculate actual cost
         actual_cost = max(5, int(ai_result['total_cost'] * 100))
         
-        if user.credits < actual_cost:
-            return jsonify({
+        # Deduct credits; the balance guard runs in the same UPDATE
+        remaining_credits = deduct_credits(user_id, actual_cost)
+        if remaining_credits is None:
+            db.session.rollback()
+            return ojson({
                 'success': False,
-                'message': f'Insufficient credits. Actual cost: {actual_cost}, available: {user.credits}'
-            }), 400
-        
-        # Deduct credits
-        user.credits -= actual_cost
+                'message': f'Insufficient credits. Actual cost: {actual_cost}, available: {user.credit_balance}'
+            }, 400)
         
         # Record transaction
         transaction = CreditTransaction(
             transaction_id=str(python_uuid.uuid4()),
             user_id=user_id,
-            transaction_type='consumption',
+            transaction_type=TransactionType.CONSUMPTION,
             amount=-actual_cost,
-            description=f'Regenerate Session: {session.mission_objective[:50]}...',
+            status=TransactionStatus.COMPLETED,
             transaction_metadata={
+                'description': f'Regenerate Session: {session.mission_objective[:50]}...',
                 'session_id': session_id,
                 'ai_cost': ai_result['total_cost'],
                 'regeneration': True
@@ -274,20 +289,21 @@ def regenerate_responses(session_id):
         # Update session
         session.ai_responses = ai_result['responses']
         session.credits_consumed += actual_cost
-        session.updated_at = datetime.utcnow()
+        session.regeneration_count = db.func.coalesce(AISession.regeneration_count, 0) + 1
+        session.last_regenerated_at = db.func.now()
         
         db.session.commit()
         
-        return jsonify({
+        return ojson({
             'success': True,
             'ai_responses': ai_result['responses'],
             'credits_consumed': actual_cost,
-            'remaining_credits': user.credits
+            'remaining_credits': remaining_credits
         })
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}), 500
+        return ojson({'success': False, 'message': str(e)}, 500)
 
 @ai_session_bp.route('/agents/info', methods=['GET'])
 def get_agent_info():
@@ -295,11 +311,11 @@ def get_agent_info():
     try:
         agent_info = multi_ai_service.get_agent_info()
         
-        return jsonify({
+        return ojson({
             'success': True,
             'agents': agent_info
         })
         
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+        return ojson({'success': False, 'message': str(e)}, 500)
 
@@ -1,162 +1,220 @@
 from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import HTTPException
 import os
+import hashlib
+import threading
+import orjson
+from cachetools import TTLCache
+from utils.json_response import conditional_json, json_etag
 
 api_management_bp = Blueprint('api_management', __name__)
 
+# Config key holding each provider's API key
+_API_KEY_CONFIG = {
+    "openai": 'OPENAI_API_KEY',
+    "perplexity": 'PERPLEXITY_API_KEY',
+    "gemini": 'GEMINI_API_KEY',
+    "claude": 'CLAUDE_API_KEY'
+}
+
+# Request field and display name for each key accepted by /configure
+_CONFIGURABLE_KEYS = {
+    "openai": ('openai_api_key', 'OpenAI'),
+    "perplexity": ('perplexity_api_key', 'Perplexity'),
+    "gemini": ('gemini_api_key', 'Gemini'),
+    "claude": ('claude_api_key', 'Claude')
+}
+
+# Fixed /test messages per provider
+_API_NOT_CONFIGURED_MSG = {
+    api_name: f'{display_name} API key not configured'
+    for api_name, (_, display_name) in _CONFIGURABLE_KEYS.items()
+}
+_API_CONFIGURED_MSG = {
+    api_name: f'{display_name} API key is configured (test connection not implemented)'
+    for api_name, (_, display_name) in _CONFIGURABLE_KEYS.items()
+}
+
+# Static part of each /status entry; only "configured" varies per request
+_API_STATUS_INFO = {
+    "openai": {
+        "name": "OpenAI",
+        "description": "GPT models for text generation and completion"
+    },
+    "perplexity": {
+        "name": "Perplexity AI",
+        "description": "Real-time search and reasoning capabilities"
+    },
+    "gemini": {
+        "name": "Google Gemini",
+        "description": "Google's multimodal AI model"
+    },
+    "claude": {
+        "name": "Anthropic Claude",
+        "description": "Constitutional AI for safe and helpful responses"
+    }
+}
+
+# /usage and /models never change, so their bodies are encoded once at import
+_USAGE_JSON = orjson.dumps({
+    "usage_stats": {
+        "openai": {
+            "requests_today": 0,
+            "tokens_used": 0,
+            "cost_estimate": "$0.00"
+        },
+        "perplexity": {
+            "requests_today": 0,
+            "searches_performed": 0,
+            "cost_estimate": "$0.00"
+        },
+        "gemini": {
+            "requests_today": 0,
+            "tokens_used": 0,
+            "cost_estimate": "$0.00"
+        },
+        "claude": {
+            "requests_today": 0,
+            "tokens_used": 0,
+            "cost_estimate": "$0.00"
+        }
+    },
+    "total_cost_today": "$0.00",
+    "note": "Usage tracking not yet implemented"
+})
+
+_MODELS_JSON = orjson.dumps({
+    "models": {
+        "openai": [
+            {"id": "gpt-4", "name": "GPT-4", "description": "Most capable model"},
+            {"id": "gpt-4-turbo", "name": "GPT-4 Turbo", "description": "Faster and cheaper GPT-4"},
+            {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo", "description": "Fast and efficient"}
+        ],
+        "perplexity": [
+            {"id": "llama-3.1-sonar-small-128k-online", "name": "Sonar Small", "description": "Fast online search"},
+            {"id": "llama-3.1-sonar-large-128k-online", "name": "Sonar Large", "description": "Comprehensive online search"}
+        ],
+        "gemini": [
+            {"id": "gemini-pro", "name": "Gemini Pro", "description": "Google's most capable model"},
+            {"id": "gemini-pro-vision", "name": "Gemini Pro Vision", "description": "Multimodal capabilities"}
+        ],
+        "claude": [
+            {"id": "claude-3-opus", "name": "Claude 3 Opus", "description": "Most powerful Claude model"},
+            {"id": "claude-3-sonnet", "name": "Claude 3 Sonnet", "description": "Balanced performance"},
+            {"id": "claude-3-haiku", "name": "Claude 3 Haiku", "description": "Fast and efficient"}
+        ]
+    }
+})
+
+_USAGE_ETAG = json_etag(_USAGE_JSON)
+_MODELS_ETAG = json_etag(_MODELS_JSON)
+
+# Connectivity test results keyed by (api_name, key hash), never by the raw key
+API_TEST_TTL = 60
+_api_test_results = TTLCache(maxsize=64, ttl=API_TEST_TTL)
+_api_test_lock = threading.Lock()
+
+# Encoded /status body and its ETag; built on first request and rebuilt whenever keys change
+_status_json = None
+
+def _build_status_json():
+    """Encode the /status payload from the current API key configuration, with its ETag"""
+    config = current_app.config
+    apis = {}
+    total_configured = 0
+    for api_name, info in _API_STATUS_INFO.items():
+        configured = bool(config.get(_API_KEY_CONFIG[api_name]))
+        total_configured += configured
+        apis[api_name] = dict(info, configured=configured)
+    
+    body = orjson.dumps({
+        "apis": apis,
+        "total_configured": total_configured
+    })
+    return body, json_etag(body)
+
+@api_management_bp.errorhandler(Exception)
+def handle_error(e):
+    """Turn unexpected errors in any route into a JSON 500"""
+    if isinstance(e, HTTPException):
+        return e
+    current_app.logger.exception("API management request failed")
+    return jsonify({'message': str(e)}), 500
+
 @api_management_bp.route('/status')
 def get_api_status():
     """Get status of all configured APIs"""
-    return jsonify({
-        "apis": {
-            "openai": {
-                "name": "OpenAI",
-                "configured": bool(current_app.config.get('OPENAI_API_KEY')),
-                "description": "GPT models for text generation and completion"
-            },
-            "perplexity": {
-                "name": "Perplexity AI", 
-                "configured": bool(current_app.config.get('PERPLEXITY_API_KEY')),
-                "description": "Real-time search and reasoning capabilities"
-            },
-            "gemini": {
-                "name": "Google Gemini",
-                "configured": bool(current_app.config.get('GEMINI_API_KEY')),
-                "description": "Google's multimodal AI model"
-            },
-            "claude": {
-                "name": "Anthropic Claude",
-                "configured": bool(current_app.config.get('CLAUDE_API_KEY')),
-                "description": "Constitutional AI for safe and helpful responses"
-            }
-        },
-        "total_configured": sum([
-            bool(current_app.config.get('OPENAI_API_KEY')),
-            bool(current_app.config.get('PERPLEXITY_API_KEY')),
-            bool(current_app.config.get('GEMINI_API_KEY')),
-            bool(current_app.config.get('CLAUDE_API_KEY'))
-        ])
-    })
+    global _status_json
+    if _status_json is None:
+        _status_json = _build_status_json()
+    return conditional_json(*_status_json)
 
 @api_management_bp.route('/configure', methods=['POST'])
 def configure_apis():
     """Configure API keys (for development/testing only)"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        updated_apis = []
-        
-        # Update OpenAI API key
-        if 'openai_api_key' in data:
-            current_app.config['OPENAI_API_KEY'] = data['openai_api_key']
-            updated_apis.append('OpenAI')
-        
-        # Update Perplexity API key
-        if 'perplexity_api_key' in data:
-            current_app.config['PERPLEXITY_API_KEY'] = data['perplexity_api_key']
-            updated_apis.append('Perplexity')
-        
-        # Update Gemini API key
-        if 'gemini_api_key' in data:
-            current_app.config['GEMINI_API_KEY'] = data['gemini_api_key']
-            updated_apis.append('Gemini')
-        
-        # Update Claude API key
-        if 'claude_api_key' in data:
-            current_app.config['CLAUDE_API_KEY'] = data['claude_api_key']
-            updated_apis.append('Claude')
-        
-        return jsonify({
-            'message': f'API keys updated for: {", ".join(updated_apis)}',
-            'updated_apis': updated_apis
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to configure APIs: {str(e)}'}), 500
+    global _status_json
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    updated_apis = []
+    for api_name, (field, display_name) in _CONFIGURABLE_KEYS.items():
+        if field in data:
+            current_app.config[_API_KEY_CONFIG[api_name]] = data[field]
+            updated_apis.append(display_name)
+    
+    # Configured flags changed, so rebuild the /status body
+    _status_json = _build_status_json()
+    
+    return jsonify({
+        'message': f'API keys updated for: {", ".join(updated_apis)}',
+        'updated_apis': updated_apis
+    }), 200
 
 @api_management_bp.route('/test/<api_name>')
 def test_api(api_name):
     """Test API connectivity (placeholder)"""
-    api_configs = {
-        'openai': current_app.config.get('OPENAI_API_KEY'),
-        'perplexity': current_app.config.get('PERPLEXITY_API_KEY'),
-        'gemini': current_app.config.get('GEMINI_API_KEY'),
-        'claude': current_app.config.get('CLAUDE_API_KEY')
-    }
-    
-    if api_name not in api_configs:
+    config_key = _API_KEY_CONFIG.get(api_name)
+    if config_key is None:
         return jsonify({'message': 'Invalid API name'}), 400
     
-    api_key = api_configs[api_name]
+    api_key = current_app.config.get(config_key)
     if not api_key:
         return jsonify({
             'api': api_name,
             'status': 'not_configured',
-            'message': f'{api_name.title()} API key not configured'
+            'message': _API_NOT_CONFIGURED_MSG[api_name]
         }), 400
     
+    return jsonify(_test_api_key(api_name, api_key))
+
+def _test_api_key(api_name, api_key):
+    """Test a configured API key, reusing a recent result for the same key"""
+    key_digest = hashlib.blake2b(api_key.encode('utf-8'), digest_size=8).digest()
+    cache_key = (api_name, key_digest)
+    with _api_test_lock:
+        result = _api_test_results.get(cache_key)
+    if result is not None:
+        return result
+    
     # In a real implementation, you would test the actual API connection here
-    return jsonify({
+    result = {
         'api': api_name,
         'status': 'configured',
-        'message': f'{api_name.title()} API key is configured (test connection not implemented)',
-        'key_preview': f"{api_key[:8]}...{api_key[-4:]}" if len(api_key) > 12 else "***"
-    })
+        'message': _API_CONFIGURED_MSG[api_name],
+        # Fingerprint of the key rather than any of its characters
+        'key_preview': f"blake2b:{key_digest[:4].hex()}"
+    }
+    with _api_test_lock:
+        _api_test_results[cache_key] = result
+    return result
 
 @api_management_bp.route('/usage')
 def get_api_usage():
     """Get API usage statistics (placeholder)"""
-    return jsonify({
-        "usage_stats": {
-            "openai": {
-                "requests_today": 0,
-                "tokens_used": 0,
-                "cost_estimate": "$0.00"
-            },
-            "perplexity": {
-                "requests_today": 0,
-                "searches_performed": 0,
-                "cost_estimate": "$0.00"
-            },
-            "gemini": {
-                "requests_today": 0,
-                "tokens_used": 0,
-                "cost_estimate": "$0.00"
-            },
-            "claude": {
-                "requests_today": 0,
-                "tokens_used": 0,
-                "cost_estimate": "$0.00"
-            }
-        },
-        "total_cost_today": "$0.00",
-        "note": "Usage tracking not yet implemented"
-    })
+    return conditional_json(_USAGE_JSON, _USAGE_ETAG)
 
 @api_management_bp.route('/models')
 def get_available_models():
     """Get available models for each API"""
-    return jsonify({
-        "models": {
-            "openai": [
-                {"id": "gpt-4", "name": "GPT-4", "description": "Most capable model"},
-                {"id": "gpt-4-turbo", "name": "GPT-4 Turbo", "description": "Faster and cheaper GPT-4"},
-                {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo", "description": "Fast and efficient"}
-            ],
-            "perplexity": [
-                {"id": "llama-3.1-sonar-small-128k-online", "name": "Sonar Small", "description": "Fast online search"},
-                {"id": "llama-3.1-sonar-large-128k-online", "name": "Sonar Large", "description": "Comprehensive online search"}
-            ],
-            "gemini": [
-                {"id": "gemini-pro", "name": "Gemini Pro", "description": "Google's most capable model"},
-                {"id": "gemini-pro-vision", "name": "Gemini Pro Vision", "description": "Multimodal capabilities"}
-            ],
-            "claude": [
-                {"id": "claude-3-opus", "name": "Claude 3 Opus", "description": "Most powerful Claude model"},
-                {"id": "claude-3-sonnet", "name": "Claude 3 Sonnet", "description": "Balanced performance"},
-                {"id": "claude-3-haiku", "name": "Claude 3 Haiku", "description": "Fast and efficient"}
-            ]
-        }
-    })
-
+    return conditional_json(_MODELS_JSON, _MODELS_ETAG)
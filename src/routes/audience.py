@@ -1,430 +1,419 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.user import db, User, TargetAudience
-from utils.init_data import get_predefined_target_audiences
+import orjson
+from flask import Blueprint, request, jsonify, current_app, g
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
+from models.user import db, User, TargetAudience, AISession
+from utils.cache import get_json, set_json, delete_json
+from utils.init_data import get_predefined_target_audience_dicts
+from utils.jwt_cache import cached_jwt_identity
+from utils.json_response import ojson, raw_json, json_etag, conditional_json, stream_json_list
+from utils.upsert import insert_or_skip
+from utils.user_cache import get_user_cached
 
 audience_bp = Blueprint('audience', __name__)
 
+_PUBLIC_ENDPOINTS = {'audience.get_predefined_audiences', 'audience.get_audience_templates'}
+
+# Per-user GET /audiences bodies are cached briefly and dropped on every write
+AUDIENCES_CACHE_TTL = 60
+
+def _audiences_cache_key(user_id):
+    return f"audiences:{user_id}:v1"
+
+# Columns behind TargetAudience.to_dict(); list endpoints read these rows without hydrating ORM objects
+AUDIENCE_COLUMNS = (
+    TargetAudience.audience_id,
+    TargetAudience.user_id,
+    TargetAudience.name,
+    TargetAudience.description,
+    TargetAudience.manual_description,
+    TargetAudience.is_custom,
+    TargetAudience.created_at,
+)
+
+# Rows fetched per round-trip when streaming search results
+AUDIENCE_STREAM_BATCH = 200
+
+# Built once so every search hits the compiled-statement cache; values are bound per request
+_SEARCH_STMT = db.select(*AUDIENCE_COLUMNS).where(
+    TargetAudience.name.ilike(db.bindparam('pattern')),
+    db.or_(
+        TargetAudience.user_id == db.bindparam('user_id'),
+        TargetAudience.is_custom == False
+    )
+).execution_options(yield_per=AUDIENCE_STREAM_BATCH)
+
+def _audience_row_dict(row):
+    """TargetAudience.to_dict() shape plus is_predefined, built from an AUDIENCE_COLUMNS row"""
+    return {
+        'audience_id': row.audience_id,
+        'user_id': row.user_id,
+        'name': row.name,
+        'description': row.description,
+        'manual_description': row.manual_description,
+        'is_custom': row.is_custom,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'is_predefined': not row.is_custom
+    }
+
+def _insert_audience(**values):
+    """Insert a custom audience in one statement, returning its AUDIENCE_COLUMNS row
+
+    Returns None when ix_ta_user_lname already holds the name for this user, in any case.
+    """
+    return insert_or_skip(db.session, TargetAudience, dict(values, is_custom=True), AUDIENCE_COLUMNS)
+
+# Audience templates never change, so the body is encoded once at import
+_TEMPLATES_JSON = orjson.dumps({
+    'demographic_fields': [
+        'age_range',
+        'gender',
+        'income_level',
+        'education_level',
+        'location',
+        'occupation',
+        'family_status',
+        'lifestyle'
+    ],
+    'psychographic_fields': [
+        'values',
+        'interests',
+        'concerns',
+        'motivations',
+        'decision_factors',
+        'communication_preferences',
+        'buying_behavior',
+        'pain_points'
+    ],
+    'examples': [
+        {
+            'name': 'Tech-Savvy Millennials',
+            'description': 'Young professionals who embrace technology and value convenience',
+            'demographics': {
+                'age_range': '25-40',
+                'income_level': '$50K-$100K',
+                'education_level': 'College educated',
+                'location': 'Urban areas'
+            },
+            'psychographics': {
+                'values': ['Innovation', 'Efficiency', 'Work-life balance'],
+                'concerns': ['Time management', 'Career growth', 'Financial security'],
+                'decision_factors': ['Reviews', 'Brand reputation', 'User experience']
+            }
+        },
+        {
+            'name': 'Budget-Conscious Families',
+            'description': 'Families with children who prioritize value and safety',
+            'demographics': {
+                'age_range': '30-50',
+                'family_status': 'Married with children',
+                'income_level': '$40K-$80K',
+                'location': 'Suburban areas'
+            },
+            'psychographics': {
+                'values': ['Family safety', 'Value for money', 'Quality'],
+                'concerns': ['Budget constraints', 'Child safety', 'Long-term value'],
+                'decision_factors': ['Price', 'Safety ratings', 'Warranty']
+            }
+        }
+    ]
+})
+
+_TEMPLATES_ETAG = json_etag(_TEMPLATES_JSON)
+
+# (predefined tuple, encoded /predefined body); re-encoded when the tuple is rebuilt
+_predefined_body = (None, None)
+
+def _predefined_json():
+    """Encoded /predefined body for the current predefined audiences"""
+    global _predefined_body
+    predefined_audiences = get_predefined_target_audience_dicts()
+    if _predefined_body[0] is not predefined_audiences:
+        _predefined_body = (predefined_audiences, orjson.dumps({
+            'audiences': predefined_audiences,
+            'total': len(predefined_audiences)
+        }))
+    return _predefined_body[1]
+
+@audience_bp.errorhandler(Exception)
+def handle_error(e):
+    """Roll back and turn unexpected errors in any route into JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    if isinstance(e, IntegrityError):
+        return jsonify({'message': 'Target audience conflicts with an existing one'}), 409
+    current_app.logger.exception("Audience request failed")
+    return jsonify({'message': str(e)}), 500
+
+@audience_bp.before_request
+def _load_identity():
+    """Verify the JWT once per request and keep the caller's identity on flask.g"""
+    if request.endpoint in _PUBLIC_ENDPOINTS:
+        return
+    # None for exempt methods such as OPTIONS
+    user_id = cached_jwt_identity()
+    if user_id is not None:
+        g.user_id = user_id
+
 @audience_bp.route('', methods=['GET'])
-@jwt_required()
 def get_audiences():
     """Get all target audiences for the current user, including predefined ones."""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        # Get user's custom target audiences
-        user_audiences = TargetAudience.query.filter_by(user_id=current_user_id).all()
-        
-        # Get predefined target audiences
-        predefined_audiences = get_predefined_target_audiences()
-        
-        # Combine and format response
-        all_audiences = []
-        
-        # Add predefined audiences
-        for audience in predefined_audiences:
-            audience_dict = audience.to_dict()
-            audience_dict['is_predefined'] = True
-            all_audiences.append(audience_dict)
-        
-        # Add user's custom audiences
-        for audience in user_audiences:
-            audience_dict = audience.to_dict()
-            audience_dict['is_predefined'] = False
-            all_audiences.append(audience_dict)
-        
-        return jsonify({
-            'audiences': all_audiences,
-            'total': len(all_audiences),
-            'custom_count': len(user_audiences),
-            'predefined_count': len(predefined_audiences)
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get audiences: {str(e)}'}), 500
+    current_user_id = g.user_id
+    cache_key = _audiences_cache_key(current_user_id)
+    cached = get_json(cache_key)
+    if cached is not None:
+        return raw_json(cached)
+    
+    # One round-trip confirms the user exists and fetches their custom audiences;
+    # a user without any yields a single row with NULL audience columns
+    rows = db.session.execute(
+        db.select(User.user_id.label('owner_id'), *AUDIENCE_COLUMNS)
+        .outerjoin(TargetAudience, TargetAudience.user_id == User.user_id)
+        .where(User.user_id == current_user_id)
+    ).all()
+    
+    if not rows:
+        return jsonify({'message': 'User not found'}), 404
+    
+    user_audiences = [_audience_row_dict(row) for row in rows if row.audience_id is not None]
+    
+    # Predefined audiences are serialized once per process
+    predefined_audiences = get_predefined_target_audience_dicts()
+    all_audiences = [*predefined_audiences, *user_audiences]
+    
+    body = orjson.dumps({
+        'audiences': all_audiences,
+        'total': len(all_audiences),
+        'custom_count': len(user_audiences),
+        'predefined_count': len(predefined_audiences)
+    })
+    set_json(cache_key, body, AUDIENCES_CACHE_TTL)
+    return raw_json(body)
 
 @audience_bp.route('', methods=['POST'])
-@jwt_required()
 def create_audience():
     """Create a new custom target audience for the current user."""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        demographics = data.get('demographics', {})
-        psychographics = data.get('psychographics', {})
-        
-        if not name:
-            return jsonify({'message': 'Audience name is required'}), 400
-        
-        # Check if user already has an audience with this name
-        existing_audience = TargetAudience.query.filter_by(
-            user_id=current_user_id, 
-            name=name
-        ).first()
-        
-        if existing_audience:
-            return jsonify({'message': 'You already have a target audience with this name'}), 409
-        
-        # Validate demographics and psychographics are dictionaries
-        if not isinstance(demographics, dict):
-            demographics = {}
-        if not isinstance(psychographics, dict):
-            psychographics = {}
-        
-        # Create new target audience
-        audience = TargetAudience(
-            user_id=current_user_id,
-            name=name,
-            description=description,
-            demographics=demographics,
-            psychographics=psychographics,
-            is_custom=True
-        )
-        
-        db.session.add(audience)
-        db.session.commit()
-        
-        audience_dict = audience.to_dict()
-        audience_dict['is_predefined'] = False
-        
-        return jsonify({
-            'message': 'Target audience created successfully',
-            'audience': audience_dict
-        }), 201
-        
-    except Exception as e:
+    current_user_id = g.user_id
+    if get_user_cached(User, current_user_id) is None:
+        return jsonify({'message': 'User not found'}), 404
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    name = data.get('name', '').strip()
+    description = data.get('description', '').strip()
+    demographics = data.get('demographics', {})
+    psychographics = data.get('psychographics', {})
+    
+    if not name:
+        return jsonify({'message': 'Audience name is required'}), 400
+    
+    # Validate demographics and psychographics are dictionaries
+    if not isinstance(demographics, dict):
+        demographics = {}
+    if not isinstance(psychographics, dict):
+        psychographics = {}
+    
+    # Create new target audience; a duplicate name inserts nothing
+    row = _insert_audience(
+        user_id=current_user_id,
+        name=name,
+        description=description,
+        demographics=demographics,
+        psychographics=psychographics
+    )
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create audience: {str(e)}'}), 500
+        return jsonify({'message': 'You already have a target audience with this name'}), 409
+    
+    db.session.commit()
+    delete_json(_audiences_cache_key(current_user_id))
+    
+    return ojson({
+        'message': 'Target audience created successfully',
+        'audience': _audience_row_dict(row)
+    }, 201)
 
 @audience_bp.route('/<audience_id>', methods=['GET'])
-@jwt_required()
 def get_audience(audience_id):
     """Get a specific target audience."""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Try to find the audience (either user's custom or predefined)
-        audience = TargetAudience.query.filter(
-            db.or_(
-                db.and_(TargetAudience.audience_id == audience_id, TargetAudience.user_id == current_user_id),
-                db.and_(TargetAudience.audience_id == audience_id, TargetAudience.is_custom == False)
-            )
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Target audience not found'}), 404
-        
-        audience_dict = audience.to_dict()
-        audience_dict['is_predefined'] = not audience.is_custom
-        
-        return jsonify({'audience': audience_dict}), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get audience: {str(e)}'}), 500
+    current_user_id = g.user_id
+    
+    # Try to find the audience (either user's custom or predefined)
+    audience = db.session.get(TargetAudience, audience_id, options=[db.raiseload('*')])
+    
+    if not audience or (audience.is_custom and audience.user_id != current_user_id):
+        return jsonify({'message': 'Target audience not found'}), 404
+    
+    return ojson({'audience': {**audience.to_dict(), 'is_predefined': not audience.is_custom}})
 
 @audience_bp.route('/<audience_id>', methods=['PUT'])
-@jwt_required()
 def update_audience(audience_id):
     """Update a custom target audience (only user's own custom audiences can be updated)."""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Only allow updating user's custom target audiences
-        audience = TargetAudience.query.filter_by(
-            audience_id=audience_id,
-            user_id=current_user_id,
-            is_custom=True
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Target audience not found or cannot be modified'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Update fields if provided
-        if 'name' in data:
-            new_name = data['name'].strip()
-            if not new_name:
-                return jsonify({'message': 'Audience name cannot be empty'}), 400
-            
-            # Check if user already has another audience with this name
-            existing_audience = TargetAudience.query.filter_by(
-                user_id=current_user_id,
-                name=new_name
-            ).filter(TargetAudience.audience_id != audience_id).first()
-            
-            if existing_audience:
-                return jsonify({'message': 'You already have a target audience with this name'}), 409
-            
-            audience.name = new_name
-        
-        if 'description' in data:
-            audience.description = data['description'].strip()
-        
-        if 'demographics' in data:
-            demographics = data['demographics']
-            if isinstance(demographics, dict):
-                audience.demographics = demographics
-            else:
-                return jsonify({'message': 'Demographics must be a valid object'}), 400
-        
-        if 'psychographics' in data:
-            psychographics = data['psychographics']
-            if isinstance(psychographics, dict):
-                audience.psychographics = psychographics
-            else:
-                return jsonify({'message': 'Psychographics must be a valid object'}), 400
-        
-        db.session.commit()
-        
-        audience_dict = audience.to_dict()
-        audience_dict['is_predefined'] = False
-        
-        return jsonify({
-            'message': 'Target audience updated successfully',
-            'audience': audience_dict
-        }), 200
+    current_user_id = g.user_id
+    
+    # Only allow updating user's custom target audiences
+    audience = db.session.get(TargetAudience, audience_id, options=[db.raiseload('*')])
+    
+    if not audience or not audience.is_custom or audience.user_id != current_user_id:
+        return jsonify({'message': 'Target audience not found or cannot be modified'}), 404
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    # Update fields if provided
+    if 'name' in data:
+        new_name = data['name'].strip()
+        if not new_name:
+            return jsonify({'message': 'Audience name cannot be empty'}), 400
+        
+        # Check if user already has another audience with this name
+        name_taken = db.session.scalar(db.select(db.exists().where(
+            TargetAudience.user_id == current_user_id,
+            db.func.lower(TargetAudience.name) == new_name.lower(),
+            TargetAudience.audience_id != audience_id
+        )))
+        
+        if name_taken:
+            return jsonify({'message': 'You already have a target audience with this name'}), 409
         
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Failed to update audience: {str(e)}'}), 500
+        audience.name = new_name
+    
+    if 'description' in data:
+        audience.description = data['description'].strip()
+    
+    if 'demographics' in data:
+        demographics = data['demographics']
+        if isinstance(demographics, dict):
+            audience.demographics = demographics
+        else:
+            return jsonify({'message': 'Demographics must be a valid object'}), 400
+    
+    if 'psychographics' in data:
+        psychographics = data['psychographics']
+        if isinstance(psychographics, dict):
+            audience.psychographics = psychographics
+        else:
+            return jsonify({'message': 'Psychographics must be a valid object'}), 400
+    
+    db.session.commit()
+    delete_json(_audiences_cache_key(current_user_id))
+    
+    return ojson({
+        'message': 'Target audience updated successfully',
+        'audience': {**audience.to_dict(), 'is_predefined': False}
+    })
 
 @audience_bp.route('/<audience_id>', methods=['DELETE'])
-@jwt_required()
 def delete_audience(audience_id):
     """Delete a custom target audience (only user's own custom audiences can be deleted)."""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Only allow deleting user's custom target audiences
-        audience = TargetAudience.query.filter_by(
-            audience_id=audience_id,
-            user_id=current_user_id,
-            is_custom=True
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Target audience not found or cannot be deleted'}), 404
-        
-        # Check if audience is being used in any AI sessions
-        if audience.ai_sessions:
-            return jsonify({
-                'message': 'Cannot delete target audience that is being used in AI sessions',
-                'sessions_count': len(audience.ai_sessions)
-            }), 409
-        
-        db.session.delete(audience)
-        db.session.commit()
-        
-        return jsonify({'message': 'Target audience deleted successfully'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Failed to delete audience: {str(e)}'}), 500
+    current_user_id = g.user_id
+    
+    # Only allow deleting user's custom target audiences
+    audience = db.session.get(TargetAudience, audience_id, options=[db.raiseload('*')])
+    
+    if not audience or not audience.is_custom or audience.user_id != current_user_id:
+        return jsonify({'message': 'Target audience not found or cannot be deleted'}), 404
+    
+    # Check if audience is being used in any AI sessions without loading them
+    sessions_count = db.session.scalar(
+        db.select(db.func.count(AISession.session_id)).where(AISession.audience_id == audience.audience_id)
+    )
+    if sessions_count:
+        return jsonify({
+            'message': 'Cannot delete target audience that is being used in AI sessions',
+            'sessions_count': sessions_count
+        }), 409
+    
+    db.session.delete(audience)
+    db.session.commit()
+    delete_json(_audiences_cache_key(current_user_id))
+    
+    return jsonify({'message': 'Target audience deleted successfully'}), 200
 
 @audience_bp.route('/predefined', methods=['GET'])
 def get_predefined_audiences():
     """Get all predefined target audiences (public endpoint)."""
-    try:
-        predefined_audiences = get_predefined_target_audiences()
-        
-        audiences = []
-        for audience in predefined_audiences:
-            audience_dict = audience.to_dict()
-            audience_dict['is_predefined'] = True
-            audiences.append(audience_dict)
-        
-        return jsonify({
-            'audiences': audiences,
-            'total': len(audiences)
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get predefined audiences: {str(e)}'}), 500
+    return raw_json(_predefined_json())
 
 @audience_bp.route('/search', methods=['GET'])
-@jwt_required()
 def search_audiences():
     """Search target audiences by name or characteristics."""
-    try:
-        current_user_id = get_jwt_identity()
-        query = request.args.get('q', '').strip()
-        
-        if not query:
-            return jsonify({'message': 'Search query is required'}), 400
-        
-        # Search in both user's custom audiences and predefined ones
-        audiences = TargetAudience.query.filter(
-            db.and_(
-                TargetAudience.name.ilike(f'%{query}%'),
-                db.or_(
-                    TargetAudience.user_id == current_user_id,
-                    TargetAudience.is_custom == False
-                )
-            )
-        ).all()
-        
-        results = []
-        for audience in audiences:
-            audience_dict = audience.to_dict()
-            audience_dict['is_predefined'] = not audience.is_custom
-            results.append(audience_dict)
-        
-        return jsonify({
-            'audiences': results,
-            'total': len(results),
-            'query': query
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Search failed: {str(e)}'}), 500
+    current_user_id = g.user_id
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        return jsonify({'message': 'Search query is required'}), 400
+    
+    # Search in both user's custom audiences and predefined ones, streaming rows as they arrive
+    rows = db.session.execute(_SEARCH_STMT, {'pattern': f'%{query}%', 'user_id': current_user_id})
+    
+    return stream_json_list(
+        'audiences',
+        map(_audience_row_dict, rows),
+        lambda total: {'total': total, 'query': query}
+    )
 
 @audience_bp.route('/manual', methods=['POST'])
-@jwt_required()
 def create_manual_audience():
     """Create a target audience from manual text input."""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        manual_description = data.get('manual_description', '').strip()
-        name = data.get('name', '').strip()
-        
-        if not manual_description:
-            return jsonify({'message': 'Manual audience description is required'}), 400
-        
-        # Generate a name if not provided
-        if not name:
-            # Extract first few words as name
-            words = manual_description.split()[:3]
-            name = ' '.join(words).title()
-            
-            # Ensure uniqueness
-            counter = 1
-            base_name = name
-            while TargetAudience.query.filter_by(user_id=current_user_id, name=name).first():
-                name = f"{base_name} {counter}"
-                counter += 1
-        
-        # Check if user already has an audience with this name
-        existing_audience = TargetAudience.query.filter_by(
-            user_id=current_user_id, 
-            name=name
-        ).first()
-        
-        if existing_audience:
-            return jsonify({'message': 'You already have a target audience with this name'}), 409
-        
-        # Create audience with manual description
-        audience = TargetAudience(
-            user_id=current_user_id,
-            name=name,
-            description=manual_description,
-            demographics={'manual_input': True},
-            psychographics={'manual_description': manual_description},
-            is_custom=True
-        )
-        
-        db.session.add(audience)
-        db.session.commit()
-        
-        audience_dict = audience.to_dict()
-        audience_dict['is_predefined'] = False
-        audience_dict['is_manual'] = True
-        
-        return jsonify({
-            'message': 'Manual target audience created successfully',
-            'audience': audience_dict
-        }), 201
-        
-    except Exception as e:
+    current_user_id = g.user_id
+    if get_user_cached(User, current_user_id) is None:
+        return jsonify({'message': 'User not found'}), 404
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    manual_description = data.get('manual_description', '').strip()
+    name = data.get('name', '').strip()
+    
+    if not manual_description:
+        return jsonify({'message': 'Manual audience description is required'}), 400
+    
+    # Generate a name if not provided
+    if not name:
+        # Extract first few words as name
+        words = manual_description.split()[:3]
+        name = ' '.join(words).title()
+        
+        # Ensure uniqueness against every taken name sharing the prefix, in one query
+        base_name = name
+        taken = set(db.session.scalars(
+            db.select(db.func.lower(TargetAudience.name)).where(
+                TargetAudience.user_id == current_user_id,
+                db.func.lower(TargetAudience.name).startswith(base_name.lower(), autoescape=True)
+            )
+        ))
+        counter = 1
+        while name.lower() in taken:
+            name = f"{base_name} {counter}"
+            counter += 1
+    
+    # Create audience with manual description; a duplicate name inserts nothing
+    row = _insert_audience(
+        user_id=current_user_id,
+        name=name,
+        description=manual_description,
+        demographics={'manual_input': True},
+        psychographics={'manual_description': manual_description}
+    )
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create manual audience: {str(e)}'}), 500
+        return jsonify({'message': 'You already have a target audience with this name'}), 409
+    
+    db.session.commit()
+    delete_json(_audiences_cache_key(current_user_id))
+    
+    return ojson({
+        'message': 'Manual target audience created successfully',
+        'audience': {**_audience_row_dict(row), 'is_manual': True}
+    }, 201)
 
 @audience_bp.route('/templates', methods=['GET'])
 def get_audience_templates():
     """Get audience creation templates and examples."""
-    try:
-        templates = {
-            'demographic_fields': [
-                'age_range',
-                'gender',
-                'income_level',
-                'education_level',
-                'location',
-                'occupation',
-                'family_status',
-                'lifestyle'
-            ],
-            'psychographic_fields': [
-                'values',
-                'interests',
-                'concerns',
-                'motivations',
-                'decision_factors',
-                'communication_preferences',
-                'buying_behavior',
-                'pain_points'
-            ],
-            'examples': [
-                {
-                    'name': 'Tech-Savvy Millennials',
-                    'description': 'Young professionals who embrace technology and value convenience',
-                    'demographics': {
-                        'age_range': '25-40',
-                        'income_level': '$50K-$100K',
-                        'education_level': 'College educated',
-                        'location': 'Urban areas'
-                    },
-                    'psychographics': {
-                        'values': ['Innovation', 'Efficiency', 'Work-life balance'],
-                        'concerns': ['Time management', 'Career growth', 'Financial security'],
-                        'decision_factors': ['Reviews', 'Brand reputation', 'User experience']
-                    }
-                },
-                {
-                    'name': 'Budget-Conscious Families',
-                    'description': 'Families with children who prioritize value and safety',
-                    'demographics': {
-                        'age_range': '30-50',
-                        'family_status': 'Married with children',
-                        'income_level': '$40K-$80K',
-                        'location': 'Suburban areas'
-                    },
-                    'psychographics': {
-                        'values': ['Family safety', 'Value for money', 'Quality'],
-                        'concerns': ['Budget constraints', 'Child safety', 'Long-term value'],
-                        'decision_factors': ['Price', 'Safety ratings', 'Warranty']
-                    }
-                }
-            ]
-        }
-        
-        return jsonify(templates), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get templates: {str(e)}'}), 500
-
+    return conditional_json(_TEMPLATES_JSON, _TEMPLATES_ETAG)
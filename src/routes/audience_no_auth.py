@@ -1,203 +1,204 @@
-from flask import Blueprint, request, jsonify
+import orjson
+from flask import Blueprint, request, jsonify, current_app, g
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
 from models.user_simple import db, TargetAudience
+from utils.cache import get_json, set_json, delete_json
+from utils.json_response import raw_json
+from utils.schemas import parse_uuid
+from utils.upsert import insert_or_skip
 
 audience_bp = Blueprint('audience', __name__)
 
+# Per-session GET /audiences bodies are cached briefly and dropped on every write
+AUDIENCES_CACHE_TTL = 60
+
+def _audiences_cache_key(session_id):
+    return f"audiences:{session_id}:v1"
+
+@audience_bp.errorhandler(Exception)
+def handle_error(e):
+    """Roll back and turn unexpected errors in any route into JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    if isinstance(e, IntegrityError):
+        return jsonify({'message': 'Target audience conflicts with an existing one'}), 409
+    current_app.logger.exception("Audience request failed")
+    return jsonify({'message': str(e)}), 500
+
+@audience_bp.before_request
+def _load_session():
+    """Fall back to the shared anonymous session when the app does not fingerprint requests"""
+    g.setdefault('session_id', 'anonymous')
+
 @audience_bp.route('', methods=['GET'])
 def get_target_audiences():
     """Get all target audiences (predefined + session-based custom)"""
-    try:
-        # Get session fingerprint from request
-        session_id = getattr(request, 'fingerprint', 'anonymous')
-        
-        # Get predefined audiences (user_id is None) and session's custom audiences
-        audiences = TargetAudience.query.filter(
-            (TargetAudience.user_id == session_id) | (TargetAudience.user_id == None)
-        ).all()
-        
-        return jsonify({
-            'target_audiences': [audience.to_dict() for audience in audiences],
-            'session_id': session_id
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get target audiences: {str(e)}'}), 500
+    session_id = g.session_id
+    cache_key = _audiences_cache_key(session_id)
+    cached = get_json(cache_key)
+    if cached is not None:
+        return raw_json(cached)
+    
+    # Get predefined audiences (user_id is None) and session's custom audiences
+    audiences = TargetAudience.query.filter(
+        (TargetAudience.user_id == session_id) | (TargetAudience.user_id == None)
+    ).all()
+    
+    body = orjson.dumps({
+        'target_audiences': [audience.to_dict() for audience in audiences],
+        'session_id': session_id
+    })
+    set_json(cache_key, body, AUDIENCES_CACHE_TTL)
+    return raw_json(body)
 
 @audience_bp.route('/manual', methods=['POST'])
 def create_manual_audience():
     """Create a new manual target audience"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Get session fingerprint from request
-        session_id = getattr(request, 'fingerprint', 'anonymous')
-        
-        manual_description = data.get('manual_description', '').strip()
-        name = data.get('name', '').strip()
-        
-        if not manual_description:
-            return jsonify({'message': 'Manual description is required'}), 400
-        
-        # Generate name if not provided
-        if not name:
-            # Create a name from the first few words of the description
-            words = manual_description.split()[:3]
-            name = ' '.join(words).title()
-            if len(name) > 50:
-                name = name[:47] + '...'
-        
-        # Check if audience already exists for this session
-        existing = TargetAudience.query.filter_by(
-            name=name,
-            user_id=session_id
-        ).first()
-        
-        if existing:
-            return jsonify({'message': 'Audience with this name already exists'}), 409
-        
-        # Create new target audience
-        audience = TargetAudience(
-            name=name,
-            description=manual_description,
-            user_id=session_id,  # Use session fingerprint instead of user_id
-            is_predefined=False
-        )
-        
-        db.session.add(audience)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience created successfully',
-            'target_audience': audience.to_dict(),
-            'session_id': session_id
-        }), 201
-        
-    except Exception as e:
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    session_id = g.session_id
+    
+    manual_description = data.get('manual_description', '').strip()
+    name = data.get('name', '').strip()
+    
+    if not manual_description:
+        return jsonify({'message': 'Manual description is required'}), 400
+    
+    # Generate name if not provided
+    if not name:
+        # Create a name from the first few words of the description
+        words = manual_description.split()[:3]
+        name = ' '.join(words).title()
+        if len(name) > 50:
+            name = name[:47] + '...'
+    
+    # Create new target audience; ix_ta_user_lname turns a duplicate name into no row
+    row = insert_or_skip(db.session, TargetAudience, {
+        'name': name,
+        'description': manual_description,
+        'user_id': session_id,  # Use session fingerprint instead of user_id
+        'is_custom': True
+    }, (TargetAudience,))
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create target audience: {str(e)}'}), 500
+        return jsonify({'message': 'Audience with this name already exists'}), 409
+    
+    # Serialize before commit expires the returned instance
+    target_audience = row[0].to_dict()
+    db.session.commit()
+    delete_json(_audiences_cache_key(session_id))
+    
+    return jsonify({
+        'message': 'Target audience created successfully',
+        'target_audience': target_audience,
+        'session_id': session_id
+    }), 201
 
 @audience_bp.route('', methods=['POST'])
 def create_audience():
     """Create a new target audience"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Get session fingerprint from request
-        session_id = getattr(request, 'fingerprint', 'anonymous')
-        
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        
-        if not name:
-            return jsonify({'message': 'Audience name is required'}), 400
-        
-        if not description:
-            return jsonify({'message': 'Audience description is required'}), 400
-        
-        # Check if audience already exists for this session
-        existing = TargetAudience.query.filter_by(
-            name=name,
-            user_id=session_id
-        ).first()
-        
-        if existing:
-            return jsonify({'message': 'Audience with this name already exists'}), 409
-        
-        # Create new target audience
-        audience = TargetAudience(
-            name=name,
-            description=description,
-            user_id=session_id,  # Use session fingerprint instead of user_id
-            is_predefined=False
-        )
-        
-        db.session.add(audience)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience created successfully',
-            'target_audience': audience.to_dict(),
-            'session_id': session_id
-        }), 201
-        
-    except Exception as e:
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    session_id = g.session_id
+    
+    name = data.get('name', '').strip()
+    description = data.get('description', '').strip()
+    
+    if not name:
+        return jsonify({'message': 'Audience name is required'}), 400
+    
+    if not description:
+        return jsonify({'message': 'Audience description is required'}), 400
+    
+    # Create new target audience; ix_ta_user_lname turns a duplicate name into no row
+    row = insert_or_skip(db.session, TargetAudience, {
+        'name': name,
+        'description': description,
+        'user_id': session_id,  # Use session fingerprint instead of user_id
+        'is_custom': True
+    }, (TargetAudience,))
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create target audience: {str(e)}'}), 500
+        return jsonify({'message': 'Audience with this name already exists'}), 409
+    
+    # Serialize before commit expires the returned instance
+    target_audience = row[0].to_dict()
+    db.session.commit()
+    delete_json(_audiences_cache_key(session_id))
+    
+    return jsonify({
+        'message': 'Target audience created successfully',
+        'target_audience': target_audience,
+        'session_id': session_id
+    }), 201
 
-@audience_bp.route('/<int:audience_id>', methods=['PUT'])
+@audience_bp.route('/<audience_id>', methods=['PUT'])
 def update_audience(audience_id):
     """Update a target audience"""
-    try:
-        # Get session fingerprint from request
-        session_id = getattr(request, 'fingerprint', 'anonymous')
-        
-        audience = TargetAudience.query.filter_by(
-            audience_id=audience_id,
-            user_id=session_id
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Audience not found or access denied'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Update fields if provided
-        if 'name' in data:
-            name = data['name'].strip()
-            if not name:
-                return jsonify({'message': 'Audience name cannot be empty'}), 400
-            audience.name = name
-        
-        if 'description' in data:
-            description = data['description'].strip()
-            if not description:
-                return jsonify({'message': 'Audience description cannot be empty'}), 400
-            audience.description = description
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience updated successfully',
-            'target_audience': audience.to_dict()
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Failed to update target audience: {str(e)}'}), 500
+    session_id = g.session_id
+    
+    audience_id = parse_uuid(audience_id)
+    if audience_id is None:
+        return jsonify({'message': 'Audience not found or access denied'}), 404
+    
+    audience = db.session.get(TargetAudience, audience_id)
+    
+    if not audience or audience.user_id != session_id:
+        return jsonify({'message': 'Audience not found or access denied'}), 404
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    # Update fields if provided
+    if 'name' in data:
+        name = data['name'].strip()
+        if not name:
+            return jsonify({'message': 'Audience name cannot be empty'}), 400
+        audience.name = name
+    
+    if 'description' in data:
+        description = data['description'].strip()
+        if not description:
+            return jsonify({'message': 'Audience description cannot be empty'}), 400
+        audience.description = description
+    
+    db.session.commit()
+    delete_json(_audiences_cache_key(session_id))
+    
+    return jsonify({
+        'message': 'Target audience updated successfully',
+        'target_audience': audience.to_dict()
+    }), 200
 
-@audience_bp.route('/<int:audience_id>', methods=['DELETE'])
+@audience_bp.route('/<audience_id>', methods=['DELETE'])
 def delete_audience(audience_id):
     """Delete a target audience"""
-    try:
-        # Get session fingerprint from request
-        session_id = getattr(request, 'fingerprint', 'anonymous')
-        
-        audience = TargetAudience.query.filter_by(
-            audience_id=audience_id,
-            user_id=session_id
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Audience not found or access denied'}), 404
-        
-        # Don't allow deletion of predefined audiences
-        if audience.user_id is None:
-            return jsonify({'message': 'Cannot delete predefined audiences'}), 403
-        
-        db.session.delete(audience)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience deleted successfully'
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Failed to delete target audience: {str(e)}'}), 500
-
+    session_id = g.session_id
+    
+    audience_id = parse_uuid(audience_id)
+    if audience_id is None:
+        return jsonify({'message': 'Audience not found or access denied'}), 404
+    
+    audience = db.session.get(TargetAudience, audience_id)
+    
+    if not audience or audience.user_id != session_id:
+        return jsonify({'message': 'Audience not found or access denied'}), 404
+    
+    # Don't allow deletion of predefined audiences
+    if audience.user_id is None:
+        return jsonify({'message': 'Cannot delete predefined audiences'}), 403
+    
+    db.session.delete(audience)
+    db.session.commit()
+    delete_json(_audiences_cache_key(session_id))
+    
+    return jsonify({
+        'message': 'Target audience deleted successfully'
+    }), 200
@@ -1,236 +1,299 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import functools
+import itertools
+
+from flask import Blueprint, request, jsonify, current_app, g
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
 from models.user_simple import db, User, TargetAudience
+from utils.cache import audiences_version_key, bump_version, dashboard_cache_key, delete_json, get_version
+from utils.json_response import not_modified, ojson, stream_json_list, version_etag
+from utils.jwt_cache import cached_jwt_identity
+from utils.pagination import CursorPage, page_params
+from utils.schemas import UNSET, decode_body, AudienceIn, AudienceUpdate, ManualAudienceIn
+from utils.upsert import insert_or_skip
+from utils.user_cache import get_user_cached
 
 audience_bp = Blueprint('audience', __name__)
 
+# Columns behind TargetAudience.to_dict(), in the same order
+AUDIENCE_COLUMNS = (
+    TargetAudience.audience_id,
+    TargetAudience.user_id,
+    TargetAudience.name,
+    TargetAudience.description,
+    TargetAudience.manual_description,
+    TargetAudience.is_custom,
+    TargetAudience.created_at,
+)
+
+# Statements built once at import; requests only bind parameters
+_CUSTOM_PAGE_STMT = (
+    db.select(*AUDIENCE_COLUMNS)
+    .where(TargetAudience.user_id == db.bindparam('user_id'))
+    .order_by(TargetAudience.audience_id)
+    .limit(db.bindparam('limit'))
+)
+_CUSTOM_PAGE_AFTER_STMT = _CUSTOM_PAGE_STMT.where(TargetAudience.audience_id > db.bindparam('cursor'))
+
+_GET_STMT = db.select(*AUDIENCE_COLUMNS).where(
+    TargetAudience.audience_id == db.bindparam('audience_id'),
+    db.or_(TargetAudience.user_id == db.bindparam('user_id'), TargetAudience.user_id == None)
+)
+
+# Only the user's own custom audiences can be edited or deleted
+_OWNED_STMT = db.select(TargetAudience).where(
+    TargetAudience.audience_id == db.bindparam('audience_id'),
+    TargetAudience.user_id == db.bindparam('user_id'),
+    TargetAudience.is_custom == True
+)
+
+# Names are unique per user regardless of case, matching ix_ta_user_lname
+_NAME_TAKEN_STMT = db.select(db.exists().where(
+    TargetAudience.user_id == db.bindparam('user_id'),
+    db.func.lower(TargetAudience.name) == db.bindparam('name'),
+    TargetAudience.audience_id != db.bindparam('audience_id')
+))
+
+def _audience_row_dict(row):
+    """TargetAudience.to_dict() shape from an AUDIENCE_COLUMNS mapping row"""
+    audience = dict(row)
+    created_at = audience['created_at']
+    audience['created_at'] = created_at.isoformat() if created_at else None
+    return audience
+
+def _insert_audience(**values):
+    """Insert a custom audience in one statement, returning its AUDIENCE_COLUMNS row
+
+    Returns None when ix_ta_user_lname already holds the name for this user, in any case.
+    """
+    return insert_or_skip(db.session, TargetAudience, dict(values, is_custom=True), AUDIENCE_COLUMNS)
+
+@functools.lru_cache(maxsize=1)
+def _predefined_audiences():
+    """Predefined audiences (user_id is None), serialized once per process
+
+    They are only written by initialize_predefined_data at startup.
+    """
+    rows = db.session.execute(
+        db.select(*AUDIENCE_COLUMNS).where(TargetAudience.user_id == None)
+    ).mappings()
+    return tuple(_audience_row_dict(row) for row in rows)
+
+@audience_bp.errorhandler(Exception)
+def handle_error(e):
+    """Roll back and turn unexpected errors in any route into JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    if isinstance(e, IntegrityError):
+        return jsonify({'message': 'Target audience conflicts with an existing one'}), 409
+    current_app.logger.exception("Audience request failed")
+    return jsonify({'message': str(e)}), 500
+
+@audience_bp.before_request
+def _load_identity():
+    """Verify the JWT once per request and keep the caller's identity on flask.g"""
+    # None for exempt methods such as OPTIONS
+    user_id = cached_jwt_identity()
+    if user_id is not None:
+        g.user_id = user_id
+        g.user = get_user_cached(User, user_id)
+
 @audience_bp.route('', methods=['GET'])
-@jwt_required()
 def get_target_audiences():
     """Get all target audiences (predefined + user's custom)"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get predefined audiences (user_id is None) and user's custom audiences
-        audiences = TargetAudience.query.filter(
-            (TargetAudience.user_id == current_user_id) | (TargetAudience.user_id == None)
-        ).all()
-        
-        return jsonify({
-            'target_audiences': [audience.to_dict() for audience in audiences]
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get target audiences: {str(e)}'}), 500
+    current_user_id = g.user_id
+    limit, cursor = page_params()
+    
+    # Clients holding the current version of this page get a bodiless 304
+    etag = version_etag(get_version(audiences_version_key(current_user_id)), current_user_id)
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    
+    # Predefined audiences come from the per-process cache and lead the first page;
+    # only a page of the user's custom ones is queried
+    params = {'user_id': current_user_id, 'limit': limit}
+    if cursor is None:
+        rows = db.session.execute(_CUSTOM_PAGE_STMT, params)
+    else:
+        rows = db.session.execute(_CUSTOM_PAGE_AFTER_STMT, dict(params, cursor=cursor))
+    rows = rows.mappings()
+    page = CursorPage(map(_audience_row_dict, rows), 'audience_id', limit)
+    predefined = _predefined_audiences() if cursor is None else ()
+    
+    response = stream_json_list(
+        'target_audiences',
+        itertools.chain(predefined, page),
+        lambda total: {'next_cursor': page.next_cursor}
+    )
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
 
 @audience_bp.route('/manual', methods=['POST'])
-@jwt_required()
 def create_manual_audience():
     """Create a new manual target audience"""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        name = data.get('name', '').strip()
-        manual_description = data.get('manual_description', '').strip()
-        
-        if not manual_description:
-            return jsonify({'message': 'Manual description is required'}), 400
-        
-        # If no name provided, generate one from description
-        if not name:
-            # Take first few words of description as name
-            words = manual_description.split()[:3]
-            name = ' '.join(words).title()
-        
-        # Check if user already has an audience with this name
-        existing = TargetAudience.query.filter_by(
-            user_id=current_user_id,
-            name=name
-        ).first()
-        
-        if existing:
-            return jsonify({'message': 'You already have a target audience with this name'}), 409
-        
-        # Create new target audience
-        audience = TargetAudience(
-            user_id=current_user_id,
-            name=name,
-            description=manual_description,  # Store in both fields for compatibility
-            manual_description=manual_description,
-            is_custom=True
-        )
-        
-        db.session.add(audience)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience created successfully',
-            'target_audience': audience.to_dict()
-        }), 201
-        
-    except Exception as e:
+    current_user_id = g.user_id
+    if g.user is None:
+        return jsonify({'message': 'User not found'}), 404
+    
+    body, error, status = decode_body(ManualAudienceIn)
+    if error:
+        return jsonify({'message': error}), status
+    
+    name = body.name
+    manual_description = body.manual_description
+    
+    if not manual_description:
+        return jsonify({'message': 'Manual description is required'}), 400
+    
+    # If no name provided, generate one from description
+    if not name:
+        # Take first few words of description as name
+        words = manual_description.split()[:3]
+        name = ' '.join(words).title()
+    
+    # Create new target audience; a duplicate name inserts nothing
+    row = _insert_audience(
+        user_id=current_user_id,
+        name=name,
+        description=manual_description,  # Store in both fields for compatibility
+        manual_description=manual_description
+    )
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create target audience: {str(e)}'}), 500
+        return jsonify({'message': 'You already have a target audience with this name'}), 409
+    
+    db.session.commit()
+    delete_json(dashboard_cache_key(current_user_id))
+    bump_version(audiences_version_key(current_user_id))
+    
+    return ojson({
+        'message': 'Target audience created successfully',
+        'target_audience': _audience_row_dict(row._mapping)
+    }, 201)
 
 @audience_bp.route('', methods=['POST'])
-@jwt_required()
 def create_structured_audience():
     """Create a new structured target audience"""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        
-        if not name or not description:
-            return jsonify({'message': 'Name and description are required'}), 400
-        
-        # Check if user already has an audience with this name
-        existing = TargetAudience.query.filter_by(
-            user_id=current_user_id,
-            name=name
-        ).first()
-        
-        if existing:
-            return jsonify({'message': 'You already have a target audience with this name'}), 409
-        
-        # Create new target audience
-        audience = TargetAudience(
-            user_id=current_user_id,
-            name=name,
-            description=description,
-            is_custom=True
-        )
-        
-        db.session.add(audience)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience created successfully',
-            'target_audience': audience.to_dict()
-        }), 201
-        
-    except Exception as e:
+    current_user_id = g.user_id
+    if g.user is None:
+        return jsonify({'message': 'User not found'}), 404
+    
+    body, error, status = decode_body(AudienceIn)
+    if error:
+        return jsonify({'message': error}), status
+    
+    name = body.name
+    description = body.description
+    
+    if not name or not description:
+        return jsonify({'message': 'Name and description are required'}), 400
+    
+    # Create new target audience; a duplicate name inserts nothing
+    row = _insert_audience(
+        user_id=current_user_id,
+        name=name,
+        description=description
+    )
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create target audience: {str(e)}'}), 500
+        return jsonify({'message': 'You already have a target audience with this name'}), 409
+    
+    db.session.commit()
+    delete_json(dashboard_cache_key(current_user_id))
+    bump_version(audiences_version_key(current_user_id))
+    
+    return ojson({
+        'message': 'Target audience created successfully',
+        'target_audience': _audience_row_dict(row._mapping)
+    }, 201)
 
 @audience_bp.route('/<audience_id>', methods=['GET'])
-@jwt_required()
 def get_target_audience(audience_id):
     """Get a specific target audience"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        audience = TargetAudience.query.filter(
-            TargetAudience.audience_id == audience_id,
-            (TargetAudience.user_id == current_user_id) | (TargetAudience.user_id == None)
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Target audience not found'}), 404
-        
-        return jsonify({
-            'target_audience': audience.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get target audience: {str(e)}'}), 500
+    current_user_id = g.user_id
+    
+    row = db.session.execute(
+        _GET_STMT, {'audience_id': audience_id, 'user_id': current_user_id}
+    ).mappings().first()
+    
+    if not row:
+        return jsonify({'message': 'Target audience not found'}), 404
+    
+    return ojson({
+        'target_audience': _audience_row_dict(row)
+    })
 
 @audience_bp.route('/<audience_id>', methods=['PUT'])
-@jwt_required()
 def update_target_audience(audience_id):
     """Update a custom target audience"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        audience = TargetAudience.query.filter_by(
-            audience_id=audience_id,
-            user_id=current_user_id,
-            is_custom=True
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Target audience not found or not editable'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Update fields
-        if 'name' in data:
-            name = data['name'].strip()
-            if not name:
-                return jsonify({'message': 'Audience name cannot be empty'}), 400
-            
-            # Check for duplicate name
-            existing = TargetAudience.query.filter(
-                TargetAudience.user_id == current_user_id,
-                TargetAudience.name == name,
-                TargetAudience.audience_id != audience_id
-            ).first()
-            
-            if existing:
-                return jsonify({'message': 'You already have a target audience with this name'}), 409
-            
-            audience.name = name
+    current_user_id = g.user_id
+    
+    audience = db.session.scalar(
+        _OWNED_STMT, {'audience_id': audience_id, 'user_id': current_user_id}
+    )
+    
+    if not audience:
+        return jsonify({'message': 'Target audience not found or not editable'}), 404
+    
+    body, error, status = decode_body(AudienceUpdate)
+    if error:
+        return jsonify({'message': error}), status
+    
+    # Update fields
+    if body.name is not UNSET:
+        name = body.name
+        if not name:
+            return jsonify({'message': 'Audience name cannot be empty'}), 400
         
-        if 'description' in data:
-            audience.description = data['description'].strip()
+        # Check for duplicate name
+        name_taken = db.session.scalar(
+            _NAME_TAKEN_STMT, {'user_id': current_user_id, 'name': name.lower(), 'audience_id': audience_id}
+        )
         
-        if 'manual_description' in data:
-            audience.manual_description = data['manual_description'].strip()
+        if name_taken:
+            return jsonify({'message': 'You already have a target audience with this name'}), 409
         
+        audience.name = name
+    
+    if body.description is not UNSET:
+        audience.description = body.description
+    
+    if body.manual_description is not UNSET:
+        audience.manual_description = body.manual_description
+    
+    try:
         db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience updated successfully',
-            'target_audience': audience.to_dict()
-        }), 200
-        
-    except Exception as e:
+    except IntegrityError:
+        # A concurrent rename or insert took the name after the check above
         db.session.rollback()
-        return jsonify({'message': f'Failed to update target audience: {str(e)}'}), 500
+        return jsonify({'message': 'You already have a target audience with this name'}), 409
+    delete_json(dashboard_cache_key(current_user_id))
+    bump_version(audiences_version_key(current_user_id))
+    
+    return jsonify({
+        'message': 'Target audience updated successfully',
+        'target_audience': audience.to_dict()
+    }), 200
 
 @audience_bp.route('/<audience_id>', methods=['DELETE'])
-@jwt_required()
 def delete_target_audience(audience_id):
     """Delete a custom target audience"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        audience = TargetAudience.query.filter_by(
-            audience_id=audience_id,
-            user_id=current_user_id,
-            is_custom=True
-        ).first()
-        
-        if not audience:
-            return jsonify({'message': 'Target audience not found or not deletable'}), 404
-        
-        db.session.delete(audience)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Target audience deleted successfully'
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Failed to delete target audience: {str(e)}'}), 500
-
+    current_user_id = g.user_id
+    
+    audience = db.session.scalar(
+        _OWNED_STMT, {'audience_id': audience_id, 'user_id': current_user_id}
+    )
+    
+    if not audience:
+        return jsonify({'message': 'Target audience not found or not deletable'}), 404
+    
+    db.session.delete(audience)
+    db.session.commit()
+    delete_json(dashboard_cache_key(current_user_id))
+    bump_version(audiences_version_key(current_user_id))
+    
+    return jsonify({
+        'message': 'Target audience deleted successfully'
+    }), 200
@@ -1,173 +1,270 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from models.user_simple import db, User
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, create_refresh_token
+import orjson
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
+from models.user_simple import db, User, BusinessType, TargetAudience
+from utils.cache import get_json, set_json, dashboard_cache_key, DASHBOARD_CACHE_TTL
+from utils.json_response import raw_json
+from utils.jwt_cache import cached_jwt_identity
+from utils.rate_limit import (
+    account_locked, clear_account_failures, clear_failed_logins, login_blocked,
+    record_account_failure, record_failed_login
+)
+from utils.user_cache import invalidate_user
 from datetime import datetime, timezone
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+# Routes that act on the signed-in user; register and login stay public
+_PROTECTED_ENDPOINTS = {'auth.get_profile', 'auth.update_profile', 'auth.get_dashboard'}
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_UPPER_RE = re.compile(r'[A-Z]')
+_LOWER_RE = re.compile(r'[a-z]')
+_DIGIT_RE = re.compile(r'\d')
+
 def validate_email(email):
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def validate_password(password):
     """Validate password strength"""
     if len(password) < 8:
         return False, "Password must be at least 8 characters long"
-    if not re.search(r'[A-Z]', password):
+    if not _UPPER_RE.search(password):
         return False, "Password must contain at least one uppercase letter"
-    if not re.search(r'[a-z]', password):
+    if not _LOWER_RE.search(password):
         return False, "Password must contain at least one lowercase letter"
-    if not re.search(r'\d', password):
+    if not _DIGIT_RE.search(password):
         return False, "Password must contain at least one number"
     return True, "Password is valid"
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        email = data.get('email', '').strip().lower()
-        password = data.get('password', '')
-        
-        # Validate input
-        if not email or not password:
-            return jsonify({'message': 'Email and password are required'}), 400
-        
-        if not validate_email(email):
-            return jsonify({'message': 'Invalid email format'}), 400
-        
-        is_valid, message = validate_password(password)
-        if not is_valid:
-            return jsonify({'message': message}), 400
-        
-        # Check if user already exists
-        existing_user = User.query.filter_by(email=email).first()
-        if existing_user:
-            return jsonify({'message': 'User with this email already exists'}), 409
-        
-        # Create new user
-        user = User(email=email)
-        user.set_password(password)
-        
-        db.session.add(user)
-        db.session.commit()
-        
-        # Create access token
-        access_token = create_access_token(identity=user.user_id)
-        
-        return jsonify({
-            'message': 'User registered successfully',
-            'access_token': access_token,
-            'user': user.to_dict()
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Registration failed: {str(e)}'}), 500
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    email = data.get('email', '').strip().lower()
+    password = data.get('password', '')
+    
+    # Validate input
+    if not email or not password:
+        return jsonify({'message': 'Email and password are required'}), 400
+    
+    if not validate_email(email):
+        return jsonify({'message': 'Invalid email format'}), 400
+    
+    is_valid, message = validate_password(password)
+    if not is_valid:
+        return jsonify({'message': message}), 400
+    
+    # Check if user already exists
+    existing_user = User.query.filter_by(email=email).first()
+    if existing_user:
+        return jsonify({'message': 'User with this email already exists'}), 409
+    
+    # Create new user
+    user = User(email=email)
+    user.set_password(password)
+    
+    db.session.add(user)
+    db.session.commit()
+    
+    # Create access and refresh tokens
+    access_token = create_access_token(identity=user.user_id)
+    refresh_token = create_refresh_token(identity=user.user_id)
+    
+    return jsonify({
+        'message': 'User registered successfully',
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'user': user.to_dict()
+    }), 201
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Login user"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        email = data.get('email', '').strip().lower()
-        password = data.get('password', '')
-        
-        if not email or not password:
-            return jsonify({'message': 'Email and password are required'}), 400
-        
-        # Find user
-        user = User.query.filter_by(email=email).first()
-        if not user or not user.check_password(password):
-            return jsonify({'message': 'Invalid email or password'}), 401
-        
-        # Update last login
-        user.last_login = datetime.now(timezone.utc)
-        db.session.commit()
-        
-        # Create access token
-        access_token = create_access_token(identity=user.user_id)
-        
-        return jsonify({
-            'message': 'Login successful',
-            'access_token': access_token,
-            'user': user.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Login failed: {str(e)}'}), 500
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    email = data.get('email', '').strip().lower()
+    password = data.get('password', '')
+    
+    if not email or not password:
+        return jsonify({'message': 'Email and password are required'}), 400
+    
+    # Throttle repeated failures per client address and account, and per account
+    # alone; remote_addr only reflects X-Forwarded-For for the hops ProxyFix trusts
+    attempt_key = f"{request.remote_addr}|{email}"
+    if login_blocked(attempt_key) or account_locked(email):
+        return jsonify({'message': 'Too many failed login attempts, please try again later'}), 429
+    
+    # Find user
+    user = User.query.filter_by(email=email).first()
+    if not user or not user.check_password(password):
+        record_failed_login(attempt_key)
+        if user:
+            record_account_failure(email)
+        return jsonify({'message': 'Invalid email or password'}), 401
+    clear_failed_logins(attempt_key)
+    clear_account_failures(email)
+    
+    # Update last login
+    user.last_login = datetime.now(timezone.utc)
+    db.session.commit()
+    
+    # Create access and refresh tokens
+    access_token = create_access_token(identity=user.user_id)
+    refresh_token = create_refresh_token(identity=user.user_id)
+    
+    return jsonify({
+        'message': 'Login successful',
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'user': user.to_dict()
+    }), 200
+
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """Exchange a refresh token for a new access token without re-checking the password"""
+    return jsonify({
+        'access_token': create_access_token(identity=get_jwt_identity())
+    }), 200
+
+@auth_bp.errorhandler(Exception)
+def handle_error(e):
+    """Roll back and turn unexpected errors in any route into JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    if isinstance(e, IntegrityError):
+        return jsonify({'message': 'User with this email already exists'}), 409
+    current_app.logger.exception("Auth request failed")
+    return jsonify({'message': str(e)}), 500
+
+@auth_bp.before_request
+def _load_identity():
+    """Verify the JWT once per request for the signed-in routes and keep the identity on flask.g"""
+    if request.endpoint not in _PROTECTED_ENDPOINTS:
+        return
+    # None for exempt methods such as OPTIONS
+    user_id = cached_jwt_identity()
+    if user_id is not None:
+        g.user_id = user_id
 
 @auth_bp.route('/profile', methods=['GET'])
-@jwt_required()
 def get_profile():
     """Get user profile"""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        return jsonify({
-            'user': user.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get profile: {str(e)}'}), 500
+    current_user_id = g.user_id
+    user = db.session.get(User, current_user_id)
+    
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+    
+    return jsonify({
+        'user': user.to_dict()
+    }), 200
 
 @auth_bp.route('/profile', methods=['PUT'])
-@jwt_required()
 def update_profile():
     """Update user profile"""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Update email if provided
-        if 'email' in data:
-            new_email = data['email'].strip().lower()
-            if not validate_email(new_email):
-                return jsonify({'message': 'Invalid email format'}), 400
-            
-            # Check if email is already taken by another user
-            existing_user = User.query.filter_by(email=new_email).first()
-            if existing_user and existing_user.user_id != user.user_id:
-                return jsonify({'message': 'Email already taken'}), 409
-            
-            user.email = new_email
-        
-        # Update password if provided
-        if 'password' in data:
-            new_password = data['password']
-            is_valid, message = validate_password(new_password)
-            if not is_valid:
-                return jsonify({'message': message}), 400
-            
-            user.set_password(new_password)
+    current_user_id = g.user_id
+    user = db.session.get(User, current_user_id)
+    
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
+    
+    # Update email if provided
+    if 'email' in data:
+        new_email = data['email'].strip().lower()
+        if not validate_email(new_email):
+            return jsonify({'message': 'Invalid email format'}), 400
         
-        db.session.commit()
+        # Check if email is already taken by another user
+        existing_user = User.query.filter_by(email=new_email).first()
+        if existing_user and existing_user.user_id != user.user_id:
+            return jsonify({'message': 'Email already taken'}), 409
         
-        return jsonify({
-            'message': 'Profile updated successfully',
-            'user': user.to_dict()
-        }), 200
+        user.email = new_email
+    
+    # Update password if provided
+    if 'password' in data:
+        new_password = data['password']
+        is_valid, message = validate_password(new_password)
+        if not is_valid:
+            return jsonify({'message': message}), 400
         
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Failed to update profile: {str(e)}'}), 500
+        user.set_password(new_password)
+    
+    db.session.commit()
+    invalidate_user(current_user_id)
+    
+    return jsonify({
+        'message': 'Profile updated successfully',
+        'user': user.to_dict()
+    }), 200
 
+@auth_bp.route('/dashboard', methods=['GET'])
+def get_dashboard():
+    """Get the user's target audiences and business types in one response"""
+    current_user_id = g.user_id
+    cache_key = dashboard_cache_key(current_user_id)
+    cached = get_json(cache_key)
+    if cached is not None:
+        return raw_json(cached)
+    
+    # Predefined rows (user_id is None) plus the user's custom ones, read as plain
+    # rows and shaped like to_dict() without hydrating ORM objects
+    audiences = db.session.execute(
+        db.select(
+            TargetAudience.audience_id, TargetAudience.user_id, TargetAudience.name,
+            TargetAudience.description, TargetAudience.manual_description,
+            TargetAudience.is_custom, TargetAudience.created_at
+        ).where((TargetAudience.user_id == current_user_id) | (TargetAudience.user_id == None))
+    )
+    business_types = db.session.execute(
+        db.select(
+            BusinessType.business_type_id, BusinessType.user_id, BusinessType.name,
+            BusinessType.description, BusinessType.industry_category,
+            BusinessType.is_custom, BusinessType.created_at
+        ).where((BusinessType.user_id == current_user_id) | (BusinessType.user_id == None))
+    )
+    
+    body = orjson.dumps({
+        'target_audiences': [
+            {
+                'audience_id': audience_id,
+                'user_id': user_id,
+                'name': name,
+                'description': description,
+                'manual_description': manual_description,
+                'is_custom': is_custom,
+                'created_at': created_at.isoformat() if created_at else None
+            }
+            for audience_id, user_id, name, description, manual_description, is_custom, created_at in audiences
+        ],
+        'business_types': [
+            {
+                'business_type_id': business_type_id,
+                'user_id': user_id,
+                'name': name,
+                'description': description,
+                'industry_category': industry_category,
+                'is_custom': is_custom,
+                'created_at': created_at.isoformat() if created_at else None
+            }
+            for business_type_id, user_id, name, description, industry_category, is_custom, created_at in business_types
+        ]
+    })
+    set_json(cache_key, body, DASHBOARD_CACHE_TTL)
+    return raw_json(body)
@@ -1,113 +1,163 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.user import db, User, BusinessType
-from utils.init_data import get_predefined_business_types
+import itertools
+
+import orjson
+from flask import Blueprint, request, jsonify, g
+from models.user import db, User, BusinessType, AISession
+from utils.cache import bump_version, businesses_version_key, get_version
+from utils.init_data import get_predefined_business_type_dicts
+from utils.json_response import ojson, json_etag, conditional_json, not_modified, stream_json_list, version_etag
+from utils.jwt_cache import cached_jwt_identity
+from utils.pagination import CursorPage, page_params, paginate
+from utils.schemas import UNSET, decode_body, BusinessIn, BusinessUpdate
+from utils.upsert import insert_or_skip
+from utils.user_cache import get_user_cached
 
 business_bp = Blueprint('business', __name__)
 
+_PUBLIC_ENDPOINTS = {'business.get_predefined_businesses'}
+
+# Upper bound on /search results, so short or wildcard-heavy queries stay cheap
+SEARCH_LIMIT = 100
+
+# Columns behind BusinessType.to_dict(); list endpoints read these rows without hydrating ORM objects
+BUSINESS_COLUMNS = (
+    BusinessType.business_type_id,
+    BusinessType.user_id,
+    BusinessType.name,
+    BusinessType.description,
+    BusinessType.industry_category,
+    BusinessType.is_custom,
+    BusinessType.created_at,
+)
+
+def _business_row_dict(row):
+    """BusinessType.to_dict() shape plus is_predefined, built from a BUSINESS_COLUMNS row"""
+    return {
+        'business_type_id': row.business_type_id,
+        'user_id': row.user_id,
+        'name': row.name,
+        'description': row.description,
+        'industry_category': row.industry_category,
+        'is_custom': row.is_custom,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'is_predefined': not row.is_custom
+    }
+
+# (predefined tuple, encoded /predefined body, its ETag); re-encoded when the tuple is rebuilt
+_predefined_body = (None, None, None)
+
+def _predefined_json():
+    """Encoded /predefined body and ETag for the current predefined business types"""
+    global _predefined_body
+    predefined_businesses = get_predefined_business_type_dicts()
+    if _predefined_body[0] is not predefined_businesses:
+        body = orjson.dumps({
+            'businesses': predefined_businesses,
+            'total': len(predefined_businesses)
+        })
+        _predefined_body = (predefined_businesses, body, json_etag(body))
+    return _predefined_body[1:]
+
+@business_bp.before_request
+def _load_identity():
+    """Verify the JWT once per request and keep the caller's identity on flask.g"""
+    if request.endpoint in _PUBLIC_ENDPOINTS:
+        return
+    # None for exempt methods such as OPTIONS
+    user_id = cached_jwt_identity()
+    if user_id is not None:
+        g.user_id = user_id
+        g.user = get_user_cached(User, user_id)
+
 @business_bp.route('', methods=['GET'])
-@jwt_required()
 def get_businesses():
     """Get all business types for the current user, including predefined ones."""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
+        current_user_id = g.user_id
+        if g.user is None:
             return jsonify({'message': 'User not found'}), 404
         
-        # Get user's custom business types
-        user_businesses = BusinessType.query.filter_by(user_id=current_user_id).all()
-        
-        # Get predefined business types
-        predefined_businesses = get_predefined_business_types()
-        
-        # Combine and format response
-        all_businesses = []
-        
-        # Add predefined businesses
-        for business in predefined_businesses:
-            business_dict = business.to_dict()
-            business_dict['is_predefined'] = True
-            all_businesses.append(business_dict)
-        
-        # Add user's custom businesses
-        for business in user_businesses:
-            business_dict = business.to_dict()
-            business_dict['is_predefined'] = False
-            all_businesses.append(business_dict)
-        
-        return jsonify({
-            'businesses': all_businesses,
-            'total': len(all_businesses),
-            'custom_count': len(user_businesses),
-            'predefined_count': len(predefined_businesses)
-        }), 200
+        limit, cursor = page_params()
+        
+        # Clients holding the current version of this page get a bodiless 304
+        etag = version_etag(get_version(businesses_version_key(current_user_id)), current_user_id)
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
+        # Get a page of the user's custom business types; predefined ones come from the
+        # per-process cache and lead the first page, so this is the only query on the path
+        rows = db.session.execute(paginate(
+            db.select(*BUSINESS_COLUMNS).where(BusinessType.user_id == current_user_id),
+            BusinessType.business_type_id, limit, cursor
+        ))
+        page = CursorPage(map(_business_row_dict, rows), 'business_type_id', limit)
+        predefined_businesses = get_predefined_business_type_dicts() if cursor is None else ()
+        
+        response = stream_json_list(
+            'businesses',
+            itertools.chain(predefined_businesses, page),
+            lambda total: {
+                'total': total,
+                'custom_count': page.count,
+                'predefined_count': len(predefined_businesses),
+                'next_cursor': page.next_cursor
+            }
+        )
+        if etag is not None:
+            response.set_etag(etag, weak=True)
+        return response
         
     except Exception as e:
         return jsonify({'message': f'Failed to get businesses: {str(e)}'}), 500
 
 @business_bp.route('', methods=['POST'])
-@jwt_required()
 def create_business():
     """Create a new custom business type for the current user."""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
+        current_user_id = g.user_id
+        if g.user is None:
             return jsonify({'message': 'User not found'}), 404
         
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
+        body, error, status = decode_body(BusinessIn)
+        if error:
+            return jsonify({'message': error}), status
         
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        industry_category = data.get('industry_category', '').strip()
+        name = body.name
+        description = body.description
+        industry_category = body.industry_category
         
         if not name:
             return jsonify({'message': 'Business name is required'}), 400
         
-        # Check if user already has a business with this name
-        existing_business = BusinessType.query.filter_by(
-            user_id=current_user_id, 
-            name=name
-        ).first()
-        
-        if existing_business:
+        # Create new business type; ix_bt_user_name makes a duplicate name insert nothing
+        row = insert_or_skip(db.session, BusinessType, {
+            'user_id': current_user_id,
+            'name': name,
+            'description': description,
+            'industry_category': industry_category,
+            'is_custom': True
+        }, BUSINESS_COLUMNS)
+        if row is None:
+            db.session.rollback()
             return jsonify({'message': 'You already have a business type with this name'}), 409
         
-        # Create new business type
-        business = BusinessType(
-            user_id=current_user_id,
-            name=name,
-            description=description,
-            industry_category=industry_category,
-            is_custom=True
-        )
-        
-        db.session.add(business)
         db.session.commit()
+        bump_version(businesses_version_key(current_user_id))
         
-        business_dict = business.to_dict()
-        business_dict['is_predefined'] = False
-        
-        return jsonify({
+        return ojson({
             'message': 'Business type created successfully',
-            'business': business_dict
-        }), 201
+            'business': _business_row_dict(row)
+        }, 201)
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Failed to create business: {str(e)}'}), 500
 
 @business_bp.route('/<business_id>', methods=['GET'])
-@jwt_required()
 def get_business(business_id):
     """Get a specific business type."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         
         # Try to find the business (either user's custom or predefined)
         business = BusinessType.query.filter(
@@ -129,11 +179,10 @@ def get_business(business_id):
         return jsonify({'message': f'Failed to get business: {str(e)}'}), 500
 
 @business_bp.route('/<business_id>', methods=['PUT'])
-@jwt_required()
 def update_business(business_id):
     """Update a custom business type (only user's own custom businesses can be updated)."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         
         # Only allow updating user's custom business types
         business = BusinessType.query.filter_by(
@@ -145,34 +194,36 @@ def update_business(business_id):
         if not business:
             return jsonify({'message': 'Business type not found or cannot be modified'}), 404
         
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
+        body, error, status = decode_body(BusinessUpdate)
+        if error:
+            return jsonify({'message': error}), status
         
         # Update fields if provided
-        if 'name' in data:
-            new_name = data['name'].strip()
+        if body.name is not UNSET:
+            new_name = body.name
             if not new_name:
                 return jsonify({'message': 'Business name cannot be empty'}), 400
             
             # Check if user already has another business with this name
-            existing_business = BusinessType.query.filter_by(
-                user_id=current_user_id,
-                name=new_name
-            ).filter(BusinessType.business_type_id != business_id).first()
+            name_taken = db.session.scalar(db.select(db.exists().where(
+                BusinessType.user_id == current_user_id,
+                BusinessType.name == new_name,
+                BusinessType.business_type_id != business_id
+            )))
             
-            if existing_business:
+            if name_taken:
                 return jsonify({'message': 'You already have a business type with this name'}), 409
             
             business.name = new_name
         
-        if 'description' in data:
-            business.description = data['description'].strip()
+        if body.description is not UNSET:
+            business.description = body.description
         
-        if 'industry_category' in data:
-            business.industry_category = data['industry_category'].strip()
+        if body.industry_category is not UNSET:
+            business.industry_category = body.industry_category
         
         db.session.commit()
+        bump_version(businesses_version_key(current_user_id))
         
         business_dict = business.to_dict()
         business_dict['is_predefined'] = False
@@ -187,14 +238,13 @@ def update_business(business_id):
         return jsonify({'message': f'Failed to update business: {str(e)}'}), 500
 
 @business_bp.route('/<business_id>', methods=['DELETE'])
-@jwt_required()
 def delete_business(business_id):
     """Delete a custom business type (only user's own custom businesses can be deleted)."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         
         # Only allow deleting user's custom business types
-        business = BusinessType.query.filter_by(
+        business = BusinessType.query.options(db.raiseload('*')).filter_by(
             business_type_id=business_id,
             user_id=current_user_id,
             is_custom=True
@@ -203,15 +253,19 @@ def delete_business(business_id):
         if not business:
             return jsonify({'message': 'Business type not found or cannot be deleted'}), 404
         
-        # Check if business is being used in any AI sessions
-        if business.ai_sessions:
+        # Check if business is being used in any AI sessions without loading them
+        sessions_count = db.session.scalar(
+            db.select(db.func.count(AISession.session_id)).where(AISession.business_type_id == business.business_type_id)
+        )
+        if sessions_count:
             return jsonify({
                 'message': 'Cannot delete business type that is being used in AI sessions',
-                'sessions_count': len(business.ai_sessions)
+                'sessions_count': sessions_count
             }), 409
         
         db.session.delete(business)
         db.session.commit()
+        bump_version(businesses_version_key(current_user_id))
         
         return jsonify({'message': 'Business type deleted successfully'}), 200
         
@@ -223,28 +277,16 @@ def delete_business(business_id):
 def get_predefined_businesses():
     """Get all predefined business types (public endpoint)."""
     try:
-        predefined_businesses = get_predefined_business_types()
-        
-        businesses = []
-        for business in predefined_businesses:
-            business_dict = business.to_dict()
-            business_dict['is_predefined'] = True
-            businesses.append(business_dict)
-        
-        return jsonify({
-            'businesses': businesses,
-            'total': len(businesses)
-        }), 200
+        return conditional_json(*_predefined_json())
         
     except Exception as e:
         return jsonify({'message': f'Failed to get predefined businesses: {str(e)}'}), 500
 
 @business_bp.route('/search', methods=['GET'])
-@jwt_required()
 def search_businesses():
     """Search business types by name or industry category."""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = g.user_id
         query = request.args.get('q', '').strip()
         industry = request.args.get('industry', '').strip()
         
@@ -261,28 +303,21 @@ def search_businesses():
             search_conditions.append(BusinessType.industry_category.ilike(f'%{industry}%'))
         
         # Search in both user's custom businesses and predefined ones
-        businesses = BusinessType.query.filter(
-            db.and_(
+        rows = db.session.execute(
+            db.select(*BUSINESS_COLUMNS).where(
                 db.or_(*search_conditions),
                 db.or_(
                     BusinessType.user_id == current_user_id,
                     BusinessType.is_custom == False
                 )
-            )
-        ).all()
-        
-        results = []
-        for business in businesses:
-            business_dict = business.to_dict()
-            business_dict['is_predefined'] = not business.is_custom
-            results.append(business_dict)
+            ).limit(SEARCH_LIMIT)
+        )
         
-        return jsonify({
-            'businesses': results,
-            'total': len(results),
-            'query': query,
-            'industry_filter': industry
-        }), 200
+        return stream_json_list(
+            'businesses',
+            map(_business_row_dict, rows),
+            lambda total: {'total': total, 'query': query, 'industry_filter': industry}
+        )
         
     except Exception as e:
         return jsonify({'message': f'Search failed: {str(e)}'}), 500
@@ -1,149 +1,222 @@
-from flask import Blueprint, request, jsonify
+import functools
+
+import orjson
+from flask import Blueprint, current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
 from models.user_simple import db, BusinessType
-import uuid
-from datetime import datetime
+from utils.cache import SHARED_ROWS_VERSION_KEY, bump_version
+from utils.json_response import ojson, stream_json_list
+from utils.pagination import CursorPage, page_params
+from utils.schemas import UNSET, decode_body, parse_uuid, BusinessIn, BusinessUpdate
+from utils.upsert import insert_or_skip
 
 business_bp = Blueprint('business', __name__)
 
+# Columns behind BusinessType.to_dict(), in the same order
+BUSINESS_TYPE_COLUMNS = (
+    BusinessType.business_type_id,
+    BusinessType.user_id,
+    BusinessType.name,
+    BusinessType.description,
+    BusinessType.industry_category,
+    BusinessType.is_custom,
+    BusinessType.created_at,
+)
+
+def _business_type_row_dict(row):
+    """BusinessType.to_dict() shape from a BUSINESS_TYPE_COLUMNS mapping row"""
+    business_type = dict(row)
+    created_at = business_type['created_at']
+    business_type['created_at'] = created_at.isoformat() if created_at else None
+    return business_type
+
+# Rows fetched per round-trip while a page is streamed
+BUSINESS_STREAM_BATCH = 200
+
+# Statements built once at import; requests only bind parameters
+_CUSTOM_PAGE_STMT = (
+    db.select(*BUSINESS_TYPE_COLUMNS)
+    .where(BusinessType.is_custom == True)
+    .order_by(BusinessType.business_type_id)
+    .limit(db.bindparam('limit'))
+    .execution_options(yield_per=BUSINESS_STREAM_BATCH)
+)
+_CUSTOM_PAGE_AFTER_STMT = _CUSTOM_PAGE_STMT.where(BusinessType.business_type_id > db.bindparam('cursor'))
+
+@functools.lru_cache(maxsize=1)
+def _predefined_business_types():
+    """Predefined business types (is_custom False), serialized once per process
+
+    They are only written by initialize_predefined_data at startup.
+    """
+    rows = db.session.execute(
+        db.select(*BUSINESS_TYPE_COLUMNS).where(BusinessType.is_custom == False)
+    ).mappings()
+    return tuple(_business_type_row_dict(row) for row in rows)
+
+@functools.lru_cache(maxsize=1)
+def _predefined_fragment():
+    """Predefined business types encoded once as a bracketless JSON array body"""
+    return orjson.dumps(_predefined_business_types(), option=orjson.OPT_NAIVE_UTC)[1:-1]
+
+@business_bp.errorhandler(Exception)
+def handle_error(e):
+    """Roll back and turn unexpected errors in any route into JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    if isinstance(e, IntegrityError):
+        return ojson({'message': 'Business type conflicts with an existing one'}, 409)
+    current_app.logger.exception("Business type request failed")
+    return ojson({'message': str(e)}, 500)
+
 @business_bp.route('', methods=['GET'])
 def get_business_types():
     """Get all business types (no auth required)"""
-    try:
-        # Get all business types for demo purposes
-        business_types = BusinessType.query.all()
-        
-        return jsonify({
-            'business_types': [bt.to_dict() for bt in business_types]
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get business types: {str(e)}'}), 500
+    # Predefined business types come from the per-process cache and lead the first page;
+    # only a page of the custom ones created for demo purposes is queried
+    limit, cursor = page_params()
+    if cursor is None:
+        rows = db.session.execute(_CUSTOM_PAGE_STMT, {'limit': limit})
+    else:
+        rows = db.session.execute(_CUSTOM_PAGE_AFTER_STMT, {'limit': limit, 'cursor': cursor})
+    rows = rows.mappings()
+    page = CursorPage(map(_business_type_row_dict, rows), 'business_type_id', limit)
+    predefined = _predefined_fragment() if cursor is None else b''
+    
+    return stream_json_list(
+        'business_types',
+        page,
+        lambda total: {'next_cursor': page.next_cursor},
+        encoded_head=predefined
+    )
 
 @business_bp.route('', methods=['POST'])
 def create_business_type():
     """Create a new business type (no auth required)"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        industry_category = data.get('industry_category', '').strip()
-        
-        if not name:
-            return jsonify({'message': 'Business name is required'}), 400
-        
-        # Check if business type with this name already exists
-        existing = BusinessType.query.filter_by(name=name).first()
-        
-        if existing:
-            return jsonify({'message': 'A business type with this name already exists'}), 409
-        
-        # Create new business type with generated ID
-        business_type = BusinessType(
-            business_type_id=str(uuid.uuid4()),
-            user_id=None,  # No user association in no-auth mode
-            name=name,
-            description=description,
-            industry_category=industry_category,
-            is_custom=True,
-            created_at=datetime.utcnow()
-        )
-        
-        db.session.add(business_type)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Business type created successfully',
-            'business_type': business_type.to_dict()
-        }), 201
-        
-    except Exception as e:
+    body, error, status = decode_body(BusinessIn)
+    if error:
+        return ojson({'message': error}, status)
+    
+    name = body.name
+    description = body.description
+    industry_category = body.industry_category
+    
+    if not name:
+        return ojson({'message': 'Business name is required'}, 400)
+    
+    # Create new business type; ix_bt_shared_name makes a duplicate name insert nothing
+    row = insert_or_skip(db.session, BusinessType, {
+        'user_id': None,  # No user association in no-auth mode
+        'name': name,
+        'description': description,
+        'industry_category': industry_category,
+        'is_custom': True
+    }, BUSINESS_TYPE_COLUMNS)
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create business type: {str(e)}'}), 500
+        return ojson({'message': 'A business type with this name already exists'}, 409)
+    
+    db.session.commit()
+    bump_version(SHARED_ROWS_VERSION_KEY)
+    
+    return ojson({
+        'message': 'Business type created successfully',
+        'business_type': _business_type_row_dict(row._mapping)
+    }, 201)
 
 @business_bp.route('/<business_type_id>', methods=['GET'])
 def get_business_type(business_type_id):
     """Get a specific business type (no auth required)"""
-    try:
-        business_type = BusinessType.query.filter_by(business_type_id=business_type_id).first()
-        
-        if not business_type:
-            return jsonify({'message': 'Business type not found'}), 404
-        
-        return jsonify({
-            'business_type': business_type.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get business type: {str(e)}'}), 500
+    business_type_id = parse_uuid(business_type_id)
+    if business_type_id is None:
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    business_type = db.session.get(BusinessType, business_type_id)
+    
+    if not business_type:
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    return ojson({
+        'business_type': business_type.to_dict()
+    })
 
 @business_bp.route('/<business_type_id>', methods=['PUT'])
 def update_business_type(business_type_id):
     """Update a business type (no auth required)"""
+    business_type_id = parse_uuid(business_type_id)
+    if business_type_id is None:
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    body, error, status = decode_body(BusinessUpdate)
+    if error:
+        return ojson({'message': error}, status)
+    
+    # Update fields
+    changes = {}
+    if body.name is not UNSET:
+        if not body.name:
+            return ojson({'message': 'Business name cannot be empty'}, 400)
+        changes['name'] = body.name
+    
+    if body.description is not UNSET:
+        changes['description'] = body.description
+    
+    if body.industry_category is not UNSET:
+        changes['industry_category'] = body.industry_category
+    
+    # One UPDATE ... RETURNING finds the row and applies the changes;
+    # ix_bt_shared_name rejects a name another shared row already has
+    match = BusinessType.business_type_id == business_type_id
+    if changes:
+        stmt = db.update(BusinessType).where(match).values(**changes).returning(*BUSINESS_TYPE_COLUMNS)
+    else:
+        stmt = db.select(*BUSINESS_TYPE_COLUMNS).where(match)
     try:
-        business_type = BusinessType.query.filter_by(business_type_id=business_type_id).first()
-        
-        if not business_type:
-            return jsonify({'message': 'Business type not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Update fields
-        if 'name' in data:
-            name = data['name'].strip()
-            if not name:
-                return jsonify({'message': 'Business name cannot be empty'}), 400
-            
-            # Check for duplicate name
-            existing = BusinessType.query.filter(
-                BusinessType.name == name,
-                BusinessType.business_type_id != business_type_id
-            ).first()
-            
-            if existing:
-                return jsonify({'message': 'A business type with this name already exists'}), 409
-            
-            business_type.name = name
-        
-        if 'description' in data:
-            business_type.description = data['description'].strip()
-        
-        if 'industry_category' in data:
-            business_type.industry_category = data['industry_category'].strip()
-        
-        business_type.updated_at = datetime.utcnow()
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Business type updated successfully',
-            'business_type': business_type.to_dict()
-        }), 200
-        
-    except Exception as e:
+        row = db.session.execute(stmt).mappings().first()
+    except IntegrityError:
         db.session.rollback()
-        return jsonify({'message': f'Failed to update business type: {str(e)}'}), 500
+        return ojson({'message': 'A business type with this name already exists'}, 409)
+    
+    if row is None:
+        db.session.rollback()
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    db.session.commit()
+    bump_version(SHARED_ROWS_VERSION_KEY)
+    if changes and not row['is_custom']:
+        _predefined_business_types.cache_clear()
+        _predefined_fragment.cache_clear()
+    
+    return ojson({
+        'message': 'Business type updated successfully',
+        'business_type': _business_type_row_dict(row)
+    })
 
 @business_bp.route('/<business_type_id>', methods=['DELETE'])
 def delete_business_type(business_type_id):
     """Delete a business type (no auth required)"""
-    try:
-        business_type = BusinessType.query.filter_by(business_type_id=business_type_id).first()
-        
-        if not business_type:
-            return jsonify({'message': 'Business type not found'}), 404
-        
-        db.session.delete(business_type)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Business type deleted successfully'
-        }), 200
-        
-    except Exception as e:
+    business_type_id = parse_uuid(business_type_id)
+    if business_type_id is None:
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    is_custom = db.session.scalar(
+        db.delete(BusinessType)
+        .where(BusinessType.business_type_id == business_type_id)
+        .returning(BusinessType.is_custom)
+    )
+    
+    if is_custom is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to delete business type: {str(e)}'}), 500
-
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    db.session.commit()
+    bump_version(SHARED_ROWS_VERSION_KEY)
+    if not is_custom:
+        _predefined_business_types.cache_clear()
+        _predefined_fragment.cache_clear()
+    
+    return ojson({
+        'message': 'Business type deleted successfully'
+    })
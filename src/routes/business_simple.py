@@ -1,181 +1,241 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import functools
+
+import orjson
+from flask import Blueprint, current_app, g
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
 from models.user_simple import db, User, BusinessType
+from utils.cache import delete_json, dashboard_cache_key
+from utils.json_response import ojson, stream_json_list
+from utils.jwt_cache import cached_jwt_identity
+from utils.pagination import CursorPage, page_params
+from utils.schemas import UNSET, decode_body, BusinessIn, BusinessUpdate
+from utils.upsert import insert_or_skip
+from utils.user_cache import get_user_cached
 
 business_bp = Blueprint('business', __name__)
 
+# Columns behind BusinessType.to_dict(), in the same order
+BUSINESS_TYPE_COLUMNS = (
+    BusinessType.business_type_id,
+    BusinessType.user_id,
+    BusinessType.name,
+    BusinessType.description,
+    BusinessType.industry_category,
+    BusinessType.is_custom,
+    BusinessType.created_at,
+)
+
+def _business_type_row_dict(row):
+    """BusinessType.to_dict() shape from a BUSINESS_TYPE_COLUMNS mapping row"""
+    business_type = dict(row)
+    created_at = business_type['created_at']
+    business_type['created_at'] = created_at.isoformat() if created_at else None
+    return business_type
+
+# Rows fetched per round-trip while a page is streamed
+BUSINESS_STREAM_BATCH = 200
+
+# Statements built once at import; requests only bind parameters
+_CUSTOM_PAGE_STMT = (
+    db.select(*BUSINESS_TYPE_COLUMNS)
+    .where(BusinessType.user_id == db.bindparam('user_id'))
+    .order_by(BusinessType.business_type_id)
+    .limit(db.bindparam('limit'))
+    .execution_options(yield_per=BUSINESS_STREAM_BATCH)
+)
+_CUSTOM_PAGE_AFTER_STMT = _CUSTOM_PAGE_STMT.where(BusinessType.business_type_id > db.bindparam('cursor'))
+
+_GET_STMT = db.select(*BUSINESS_TYPE_COLUMNS).where(
+    BusinessType.business_type_id == db.bindparam('business_type_id'),
+    db.or_(BusinessType.user_id == db.bindparam('user_id'), BusinessType.user_id == None)
+)
+
+def _owned_business_type(business_type_id, user_id):
+    """WHERE clauses for a custom business type owned by user_id"""
+    return (
+        BusinessType.business_type_id == business_type_id,
+        BusinessType.user_id == user_id,
+        BusinessType.is_custom == True
+    )
+
+@functools.lru_cache(maxsize=1)
+def _predefined_business_types():
+    """Predefined business types (user_id is None), serialized once per process
+
+    They are only written by initialize_predefined_data at startup.
+    """
+    rows = db.session.execute(
+        db.select(*BUSINESS_TYPE_COLUMNS).where(BusinessType.user_id == None)
+    ).mappings()
+    return tuple(_business_type_row_dict(row) for row in rows)
+
+@functools.lru_cache(maxsize=1)
+def _predefined_fragment():
+    """Predefined business types encoded once as a bracketless JSON array body"""
+    return orjson.dumps(_predefined_business_types(), option=orjson.OPT_NAIVE_UTC)[1:-1]
+
+@business_bp.errorhandler(Exception)
+def handle_error(e):
+    """Roll back and turn unexpected errors in any route into JSON"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    if isinstance(e, IntegrityError):
+        return ojson({'message': 'Business type conflicts with an existing one'}, 409)
+    current_app.logger.exception("Business type request failed")
+    return ojson({'message': str(e)}, 500)
+
+@business_bp.before_request
+def _load_identity():
+    """Verify the JWT once per request and keep the caller's identity on flask.g"""
+    # None for exempt methods such as OPTIONS
+    user_id = cached_jwt_identity()
+    if user_id is not None:
+        g.user_id = user_id
+        g.user = get_user_cached(User, user_id)
+
 @business_bp.route('', methods=['GET'])
-@jwt_required()
 def get_business_types():
     """Get all business types (predefined + user's custom)"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        # Get predefined business types (user_id is None) and user's custom business types
-        business_types = BusinessType.query.filter(
-            (BusinessType.user_id == current_user_id) | (BusinessType.user_id == None)
-        ).all()
-        
-        return jsonify({
-            'business_types': [bt.to_dict() for bt in business_types]
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get business types: {str(e)}'}), 500
+    current_user_id = g.user_id
+    limit, cursor = page_params()
+    
+    # Predefined business types come from the per-process cache and lead the first page;
+    # only a page of the user's custom ones is queried
+    params = {'user_id': current_user_id, 'limit': limit}
+    if cursor is None:
+        rows = db.session.execute(_CUSTOM_PAGE_STMT, params)
+    else:
+        rows = db.session.execute(_CUSTOM_PAGE_AFTER_STMT, dict(params, cursor=cursor))
+    rows = rows.mappings()
+    page = CursorPage(map(_business_type_row_dict, rows), 'business_type_id', limit)
+    predefined = _predefined_fragment() if cursor is None else b''
+    
+    return stream_json_list(
+        'business_types',
+        page,
+        lambda total: {'next_cursor': page.next_cursor},
+        encoded_head=predefined
+    )
 
 @business_bp.route('', methods=['POST'])
-@jwt_required()
 def create_business_type():
     """Create a new custom business type"""
-    try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        industry_category = data.get('industry_category', '').strip()
-        
-        if not name:
-            return jsonify({'message': 'Business name is required'}), 400
-        
-        # Check if user already has a business type with this name
-        existing = BusinessType.query.filter_by(
-            user_id=current_user_id,
-            name=name
-        ).first()
-        
-        if existing:
-            return jsonify({'message': 'You already have a business type with this name'}), 409
-        
-        # Create new business type
-        business_type = BusinessType(
-            user_id=current_user_id,
-            name=name,
-            description=description,
-            industry_category=industry_category,
-            is_custom=True
-        )
-        
-        db.session.add(business_type)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Business type created successfully',
-            'business_type': business_type.to_dict()
-        }), 201
-        
-    except Exception as e:
+    current_user_id = g.user_id
+    if g.user is None:
+        return ojson({'message': 'User not found'}, 404)
+    
+    body, error, status = decode_body(BusinessIn)
+    if error:
+        return ojson({'message': error}, status)
+    
+    name = body.name
+    description = body.description
+    industry_category = body.industry_category
+    
+    if not name:
+        return ojson({'message': 'Business name is required'}, 400)
+    
+    # Create new business type; ix_bt_user_name makes a duplicate name insert nothing
+    row = insert_or_skip(db.session, BusinessType, {
+        'user_id': current_user_id,
+        'name': name,
+        'description': description,
+        'industry_category': industry_category,
+        'is_custom': True
+    }, BUSINESS_TYPE_COLUMNS)
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to create business type: {str(e)}'}), 500
+        return ojson({'message': 'You already have a business type with this name'}, 409)
+    
+    db.session.commit()
+    delete_json(dashboard_cache_key(current_user_id))
+    
+    return ojson({
+        'message': 'Business type created successfully',
+        'business_type': _business_type_row_dict(row._mapping)
+    }, 201)
 
 @business_bp.route('/<business_type_id>', methods=['GET'])
-@jwt_required()
 def get_business_type(business_type_id):
     """Get a specific business type"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        business_type = BusinessType.query.filter(
-            BusinessType.business_type_id == business_type_id,
-            (BusinessType.user_id == current_user_id) | (BusinessType.user_id == None)
-        ).first()
-        
-        if not business_type:
-            return jsonify({'message': 'Business type not found'}), 404
-        
-        return jsonify({
-            'business_type': business_type.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Failed to get business type: {str(e)}'}), 500
+    current_user_id = g.user_id
+    
+    row = db.session.execute(
+        _GET_STMT, {'business_type_id': business_type_id, 'user_id': current_user_id}
+    ).mappings().first()
+    
+    if not row:
+        return ojson({'message': 'Business type not found'}, 404)
+    
+    return ojson({
+        'business_type': _business_type_row_dict(row)
+    })
 
 @business_bp.route('/<business_type_id>', methods=['PUT'])
-@jwt_required()
 def update_business_type(business_type_id):
     """Update a custom business type"""
+    current_user_id = g.user_id
+    
+    body, error, status = decode_body(BusinessUpdate)
+    if error:
+        return ojson({'message': error}, status)
+    
+    # Update fields
+    changes = {}
+    if body.name is not UNSET:
+        if not body.name:
+            return ojson({'message': 'Business name cannot be empty'}, 400)
+        changes['name'] = body.name
+    
+    if body.description is not UNSET:
+        changes['description'] = body.description
+    
+    if body.industry_category is not UNSET:
+        changes['industry_category'] = body.industry_category
+    
+    # One UPDATE ... RETURNING both checks ownership and applies the changes;
+    # ix_bt_user_name rejects a name the user already has
+    owned = _owned_business_type(business_type_id, current_user_id)
+    if changes:
+        stmt = db.update(BusinessType).where(*owned).values(**changes).returning(*BUSINESS_TYPE_COLUMNS)
+    else:
+        stmt = db.select(*BUSINESS_TYPE_COLUMNS).where(*owned)
     try:
-        current_user_id = get_jwt_identity()
-        
-        business_type = BusinessType.query.filter_by(
-            business_type_id=business_type_id,
-            user_id=current_user_id,
-            is_custom=True
-        ).first()
-        
-        if not business_type:
-            return jsonify({'message': 'Business type not found or not editable'}), 404
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 400
-        
-        # Update fields
-        if 'name' in data:
-            name = data['name'].strip()
-            if not name:
-                return jsonify({'message': 'Business name cannot be empty'}), 400
-            
-            # Check for duplicate name
-            existing = BusinessType.query.filter(
-                BusinessType.user_id == current_user_id,
-                BusinessType.name == name,
-                BusinessType.business_type_id != business_type_id
-            ).first()
-            
-            if existing:
-                return jsonify({'message': 'You already have a business type with this name'}), 409
-            
-            business_type.name = name
-        
-        if 'description' in data:
-            business_type.description = data['description'].strip()
-        
-        if 'industry_category' in data:
-            business_type.industry_category = data['industry_category'].strip()
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Business type updated successfully',
-            'business_type': business_type.to_dict()
-        }), 200
-        
-    except Exception as e:
+        row = db.session.execute(stmt).mappings().first()
+    except IntegrityError:
+        db.session.rollback()
+        return ojson({'message': 'You already have a business type with this name'}, 409)
+    
+    if row is None:
         db.session.rollback()
-        return jsonify({'message': f'Failed to update business type: {str(e)}'}), 500
+        return ojson({'message': 'Business type not found or not editable'}, 404)
+    
+    db.session.commit()
+    delete_json(dashboard_cache_key(current_user_id))
+    
+    return ojson({
+        'message': 'Business type updated successfully',
+        'business_type': _business_type_row_dict(row)
+    })
 
 @business_bp.route('/<business_type_id>', methods=['DELETE'])
-@jwt_required()
 def delete_business_type(business_type_id):
     """Delete a custom business type"""
-    try:
-        current_user_id = get_jwt_identity()
-        
-        business_type = BusinessType.query.filter_by(
-            business_type_id=business_type_id,
-            user_id=current_user_id,
-            is_custom=True
-        ).first()
-        
-        if not business_type:
-            return jsonify({'message': 'Business type not found or not deletable'}), 404
-        
-        db.session.delete(business_type)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Business type deleted successfully'
-        }), 200
-        
-    except Exception as e:
+    current_user_id = g.user_id
+    
+    deleted = db.session.execute(
+        db.delete(BusinessType).where(*_owned_business_type(business_type_id, current_user_id))
+    ).rowcount
+    
+    if not deleted:
         db.session.rollback()
-        return jsonify({'message': f'Failed to delete business type: {str(e)}'}), 500
-
+        return ojson({'message': 'Business type not found or not deletable'}, 404)
+    
+    db.session.commit()
+    delete_json(dashboard_cache_key(current_user_id))
+    
+    return ojson({
+        'message': 'Business type deleted successfully'
+    })
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.user_simple import db, User, CreditTransaction, TransactionType, TransactionStatus
 from utils.paypal_service import PayPalService
@@ -7,6 +7,12 @@ from datetime import datetime, timezone
 
 payment_bp = Blueprint('payment', __name__)
 
+def _paypal_service():
+    """PayPal service for the current request, created once and kept on flask.g"""
+    if 'paypal_service' not in g:
+        g.paypal_service = PayPalService()
+    return g.paypal_service
+
 # Credit packages with dynamic pricing (includes PayPal fees for profitability)
 CREDIT_PACKAGES = [
     {
@@ -137,7 +143,7 @@ def initiate_purchase():
         db.session.commit()
         
         # Initialize PayPal service
-        paypal_service = PayPalService()
+        paypal_service = _paypal_service()
         
         if paypal_service.is_configured():
             try:
@@ -230,7 +236,7 @@ def complete_purchase():
             return jsonify({'message': 'Transaction not found or already processed'}), 404
         
         # Initialize PayPal service
-        paypal_service = PayPalService()
+        paypal_service = _paypal_service()
         
         if paypal_service.is_configured() and (paypal_order_id or transaction.paypal_order_id):
             try:
@@ -3,14 +3,35 @@ import requests
 import json
 import random
 from datetime import datetime
+from functools import lru_cache
 from flask import current_app
 
+@lru_cache(maxsize=8)
+def _credit_cost(long_objective, custom_business, manual_audience):
+    """Credit cost for a session, keyed on the only inputs that affect pricing."""
+    base_cost = 1.0  # Base cost per session
+    
+    # Add cost based on complexity
+    if long_objective:
+        base_cost += 0.5
+    
+    # Add cost for custom business types
+    if custom_business:
+        base_cost += 0.3
+    
+    # Add cost for manual audience descriptions
+    if manual_audience:
+        base_cost += 0.2
+    
+    return round(base_cost, 2)
+
 class AIService:
     """Enhanced AI service for generating contextual persuasion responses."""
     
-    def __init__(self):
-        self.openai_api_key = current_app.config.get('OPENAI_API_KEY')
-        self.anthropic_api_key = current_app.config.get('ANTHROPIC_API_KEY')
+    def __init__(self, openai_api_key, anthropic_api_key):
+        self.openai_api_key = openai_api_key
+        self.anthropic_api_key = anthropic_api_key
+        self._available_models = None
         
         # Initialize OpenAI if API key is available
         if self.openai_api_key:
@@ -293,24 +314,12 @@ Response:"""
     
     def calculate_credit_cost(self, session_data):
         """Calculate credit cost for an AI session."""
-        base_cost = 1.0  # Base cost per session
-        
-        # Add cost based on complexity
-        if session_data.get('mission_objective'):
-            objective_length = len(session_data['mission_objective'])
-            if objective_length > 100:
-                base_cost += 0.5
-        
-        # Add cost for custom business types
-        if session_data.get('business_type', {}).get('is_custom'):
-            base_cost += 0.3
-        
-        # Add cost for manual audience descriptions
         audience = session_data.get('target_audience', {})
-        if audience.get('psychographics', {}).get('manual_description'):
-            base_cost += 0.2
-        
-        return round(base_cost, 2)
+        return _credit_cost(
+            len(session_data.get('mission_objective') or '') > 100,
+            bool(session_data.get('business_type', {}).get('is_custom')),
+            bool(audience.get('psychographics', {}).get('manual_description'))
+        )
     
     def is_configured(self):
         """Check if AI service is properly configured."""
@@ -318,6 +327,8 @@ Response:"""
     
     def get_available_models(self):
         """Get list of available AI models."""
+        if self._available_models is not None:
+            return self._available_models
         models = []
         
         if self.openai_api_key:
@@ -329,5 +340,24 @@ Response:"""
         if not models:
             models.append('template-based')
         
-        return models
+        self._available_models = tuple(models)
+        return self._available_models
+
+_ai_service = None
+
+def get_ai_service():
+    """Return the shared AIService, rebuilt when the configured API keys change.
 
+    Must be called inside an app context; keys set at runtime through
+    /api/apis/configure are picked up on the next call.
+    """
+    global _ai_service
+    openai_api_key = current_app.config.get('OPENAI_API_KEY')
+    # /configure stores the Anthropic key as CLAUDE_API_KEY
+    anthropic_api_key = (current_app.config.get('ANTHROPIC_API_KEY')
+                         or current_app.config.get('CLAUDE_API_KEY'))
+    service = _ai_service
+    if (service is None or service.openai_api_key != openai_api_key
+            or service.anthropic_api_key != anthropic_api_key):
+        service = _ai_service = AIService(openai_api_key, anthropic_api_key)
+    return service
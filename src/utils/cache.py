@@ -0,0 +1,88 @@
+import logging
+import os
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Combined audiences + business types payload behind GET /api/auth/dashboard,
+# dropped by every audience or business type write
+DASHBOARD_CACHE_TTL = 300
+
+# Write counter for rows shared by every user (user_id NULL). Every dashboard
+# shows them, so it is part of each dashboard key instead of a per-user delete.
+SHARED_ROWS_VERSION_KEY = 'shared:rows_ver'
+
+_redis = None
+
+def get_redis():
+    """Return the shared Redis client when REDIS_URL is set, otherwise None"""
+    global _redis
+    if _redis is None:
+        redis_url = os.getenv('REDIS_URL')
+        if not redis_url:
+            return None
+        _redis = redis.Redis.from_url(redis_url)
+    return _redis
+
+def get_json(key):
+    """Return the encoded JSON body cached in Redis under key, or None"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return client.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Response cache read failed: {str(e)}")
+        return None
+
+def set_json(key, body, ttl):
+    """Cache an encoded JSON body in Redis under key for ttl seconds"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.set(key, body, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Response cache write failed: {str(e)}")
+
+def delete_json(key):
+    """Drop a cached JSON body after the data behind it changes"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.delete(key)
+    except redis.RedisError as e:
+        logger.warning(f"Response cache invalidation failed: {str(e)}")
+
+def dashboard_cache_key(user_id):
+    """Key for user_id's dashboard body, which moves on whenever shared rows change"""
+    return f"user:{user_id}:dash:{get_version(SHARED_ROWS_VERSION_KEY) or 0}"
+
+def get_version(key):
+    """Return the write counter stored in Redis under key (0 if never bumped), or None without Redis"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return int(client.get(key) or 0)
+    except redis.RedisError as e:
+        logger.warning(f"Version counter read failed: {str(e)}")
+        return None
+
+def bump_version(key):
+    """Advance the write counter under key so ETags built from it stop matching"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.incr(key)
+    except redis.RedisError as e:
+        logger.warning(f"Version counter bump failed: {str(e)}")
+
+def audiences_version_key(user_id):
+    return f"user:{user_id}:audience_ver"
+
+def businesses_version_key(user_id):
+    return f"user:{user_id}:business_ver"
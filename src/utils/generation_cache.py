@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+import redis
+from cachetools import TTLCache
+
+from utils.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Identical business/audience/objective triples reuse the last AI generation
+# instead of paying for another round of provider calls.
+GENERATION_CACHE_TTL = 3600
+GENERATION_CACHE_SIZE = 1000
+
+# With REDIS_URL set, generations are also shared through Redis under this prefix
+GENERATION_REDIS_PREFIX = 'generation:'
+
+# Fraction of the normal credit cost charged when a cached generation is reused
+CACHED_GENERATION_COST_FACTOR = 0.5
+
+# Worker threads available for provider calls started through submit_generation
+GENERATION_WORKERS = 8
+
+_generation_cache = TTLCache(maxsize=GENERATION_CACHE_SIZE, ttl=GENERATION_CACHE_TTL)
+_generation_lock = threading.Lock()
+_inflight = {}
+_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix='generation')
+
+def generation_cache_key(kind, business_type_id, audience_id, mission_objective):
+    """Build a compact cache key for an AI generation request
+
+    kind names the producer ('persuasion' or 'multi_agent'); each stores a
+    different result shape, so their entries and in-flight calls stay apart.
+    """
+    raw = f"{kind}|{business_type_id}|{audience_id}|{mission_objective}".encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def get_cached_generation(key):
+    """Return the cached generation for key, or None"""
+    with _generation_lock:
+        result = _generation_cache.get(key)
+    if result is not None:
+        return result
+    
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        cached = client.get(GENERATION_REDIS_PREFIX + key)
+    except redis.RedisError as e:
+        logger.warning(f"Generation cache read failed: {str(e)}")
+        return None
+    if cached is None:
+        return None
+    
+    result = orjson.loads(cached)
+    with _generation_lock:
+        _generation_cache[key] = result
+    return result
+
+def cache_generation(key, result):
+    """Store a generation result under key"""
+    with _generation_lock:
+        _generation_cache[key] = result
+    
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.set(GENERATION_REDIS_PREFIX + key, orjson.dumps(result), ex=GENERATION_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning(f"Generation cache write failed: {str(e)}")
+
+def submit_generation(key, fn, *args):
+    """Run fn(*args) in the background, sharing one call among identical in-flight requests
+
+    Returns a concurrent.futures.Future. A successful result is also stored in the
+    generation cache, so callers that stop waiting do not waste the provider spend.
+    """
+    with _generation_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        future = _executor.submit(fn, *args)
+        _inflight[key] = future
+    future.add_done_callback(lambda done: _finish_generation(key, done))
+    return future
+
+def _finish_generation(key, future):
+    """Drop the in-flight entry for key and cache its result"""
+    with _generation_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+    if not future.cancelled() and future.exception() is None:
+        cache_generation(key, future.result())
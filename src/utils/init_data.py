@@ -1,3 +1,5 @@
+import functools
+
 from src.models.user import db, BusinessType, TargetAudience, PREDEFINED_BUSINESS_TYPES, PREDEFINED_TARGET_AUDIENCES
 
 def initialize_predefined_data():
@@ -38,6 +40,8 @@ def initialize_predefined_data():
     
     try:
         db.session.commit()
+        get_predefined_business_type_dicts.cache_clear()
+        get_predefined_target_audience_dicts.cache_clear()
     except Exception as e:
         db.session.rollback()
         print(f"Error initializing predefined data: {e}")
@@ -50,3 +54,25 @@ def get_predefined_target_audiences():
     """Get all predefined target audiences."""
     return TargetAudience.query.filter_by(is_custom=False).all()
 
+
+@functools.lru_cache(maxsize=1)
+def get_predefined_business_type_dicts():
+    """Serialized predefined business types, built once per process.
+
+    Predefined rows only change through initialize_predefined_data, which clears this cache.
+    """
+    return tuple(
+        {**business.to_dict(), 'is_predefined': True}
+        for business in get_predefined_business_types()
+    )
+
+@functools.lru_cache(maxsize=1)
+def get_predefined_target_audience_dicts():
+    """Serialized predefined target audiences, built once per process.
+
+    Predefined rows only change through initialize_predefined_data, which clears this cache.
+    """
+    return tuple(
+        {**audience.to_dict(), 'is_predefined': True}
+        for audience in get_predefined_target_audiences()
+    )
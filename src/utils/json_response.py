@@ -0,0 +1,84 @@
+import hashlib
+import time
+
+import orjson
+from flask import current_app, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson
+
+    Types orjson does not handle natively, plus datetimes (kept in Flask's
+    HTTP date format), fall through to DefaultJSONProvider.default.
+    """
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def ojson(payload, status=200):
+    """Serialize payload with orjson and wrap it in a JSON response"""
+    return raw_json(orjson.dumps(payload, option=orjson.OPT_NAIVE_UTC), status)
+
+def raw_json(body, status=200):
+    """Wrap an already-encoded JSON body in a response"""
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+def json_etag(body):
+    """Stable ETag for an encoded JSON body"""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+def conditional_json(body, etag):
+    """Serve an encoded JSON body with its ETag, answering a matching If-None-Match with 304"""
+    response = raw_json(body)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+# Differs on every process start, so version ETags also cover rows loaded at startup
+_BOOT_ID = format(time.time_ns(), 'x')
+
+def version_etag(version, *parts):
+    """Weak ETag value for a response that only changes when version does
+
+    Returns None when there is no version counter (no Redis), so callers skip ETags.
+    """
+    if version is None:
+        return None
+    return '-'.join(map(str, (*parts, version, _BOOT_ID)))
+
+def not_modified(etag):
+    """Empty 304 for a client whose If-None-Match already holds the weak etag"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def stream_json_list(key, items, trailer=None, encoded_head=b''):
+    """Stream {key: [...]} encoding one item at a time instead of buffering the whole list
+
+    trailer, if given, is called with the item count after the list is written and
+    returns further top-level fields. The request context stays open while streaming,
+    so items may come straight from a database result. encoded_head is an
+    already-encoded, comma-separated run of items (no brackets) written before
+    items; it is copied as is and not counted.
+    """
+    def generate():
+        yield b'{' + orjson.dumps(key) + b':[' + encoded_head
+        count = 0
+        for item in items:
+            if count or encoded_head:
+                yield b','
+            yield orjson.dumps(item, option=orjson.OPT_NAIVE_UTC)
+            count += 1
+        yield b']'
+        if trailer is not None:
+            for field, value in trailer(count).items():
+                yield b',' + orjson.dumps(field) + b':' + orjson.dumps(value, option=orjson.OPT_NAIVE_UTC)
+        yield b'}'
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
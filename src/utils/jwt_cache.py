@@ -0,0 +1,38 @@
+import hashlib
+import threading
+import time
+
+from cachetools import TTLCache
+from flask import request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+
+# Verified bearer tokens keyed by digest, so polling clients skip repeated signature checks
+JWT_CACHE_TTL = 30
+JWT_CACHE_SIZE = 1024
+
+_verified_tokens = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
+_verified_lock = threading.Lock()
+
+def cached_jwt_identity():
+    """Return the identity for the request's bearer token, verifying it only on a cache miss
+
+    Raises the usual flask_jwt_extended errors for missing or invalid tokens.
+    Returns None for methods exempt from JWT checks, such as OPTIONS.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    token_key = None
+    if auth_header.startswith('Bearer '):
+        token_key = hashlib.blake2b(auth_header[7:].encode('utf-8'), digest_size=16).digest()
+        with _verified_lock:
+            cached = _verified_tokens.get(token_key)
+        if cached and cached[1] > time.time():
+            return cached[0]
+    
+    if verify_jwt_in_request() is None:
+        return None
+    
+    identity = get_jwt_identity()
+    if token_key is not None:
+        with _verified_lock:
+            _verified_tokens[token_key] = (identity, get_jwt().get('exp', 0))
+    return identity
@@ -1,14 +1,24 @@
 import os
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 from typing import Dict, List, Optional, Tuple
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Provider calls are blocking HTTP requests; agents are fanned out over this pool
+_ai_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ai-provider')
+
+# One pooled session for all provider calls so TLS connections are reused across requests
+_http = requests.Session()
+_http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 class EnhancedMultiAIService:
     """
     Enhanced Multi-AI service with OpenAI, Gemini, Claude, and Perplexity
@@ -151,7 +161,7 @@ Generate a persuasive response that helps achieve the mission objective."""
                 'temperature': 0.7
             }
             
-            response = requests.post(self.openai_url, headers=headers, json=data, timeout=30)
+            response = _http.post(self.openai_url, headers=headers, json=data, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -188,7 +198,7 @@ Generate a persuasive response that helps achieve the mission objective."""
                 }
             }
             
-            response = requests.post(self.gemini_url, headers=headers, json=data, timeout=30)
+            response = _http.post(self.gemini_url, headers=headers, json=data, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -226,7 +236,7 @@ Generate a persuasive response that helps achieve the mission objective."""
                 ]
             }
             
-            response = requests.post(self.claude_url, headers=headers, json=data, timeout=30)
+            response = _http.post(self.claude_url, headers=headers, json=data, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -268,7 +278,7 @@ Generate a persuasive response that helps achieve the mission objective."""
                 'temperature': 0.6
             }
             
-            response = requests.post(self.perplexity_url, headers=headers, json=data, timeout=30)
+            response = _http.post(self.perplexity_url, headers=headers, json=data, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -306,6 +316,45 @@ Generate a persuasive response that helps achieve the mission objective."""
         }
         return fallbacks.get(agent_type, "This comprehensive strategy aligns perfectly with your business objectives and addresses your audience's core needs and motivations.")
     
+    def _generate_agent_response(self, agent_type: str, business: Dict, audience: Dict, mission: str) -> Dict:
+        """Generate a single agent's response with its designated AI provider"""
+        agent_config = self.agents[agent_type]
+        
+        try:
+            # Generate system prompt
+            system_prompt = self.generate_system_prompt(agent_type, business, audience, mission)
+            
+            # Call appropriate AI provider
+            if agent_config['provider'].startswith('OpenAI'):
+                content, cost = asyncio.run(self.call_openai(system_prompt, agent_type))
+            elif agent_config['provider'].startswith('Google'):
+                content, cost = asyncio.run(self.call_gemini(system_prompt, agent_type))
+            elif agent_config['provider'].startswith('Claude'):
+                content, cost = asyncio.run(self.call_claude(system_prompt, agent_type))
+            elif agent_config['provider'].startswith('Perplexity'):
+                content, cost = asyncio.run(self.call_perplexity(system_prompt, agent_type))
+            else:
+                content, cost = self._get_fallback_response(agent_type), agent_config['cost_per_call']
+            
+            return {
+                'agent_name': agent_config['name'],
+                'provider': agent_config['provider'],
+                'content': content,
+                'cost': cost,
+                'timestamp': time.time()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generating response for {agent_type}: {str(e)}")
+            return {
+                'agent_name': agent_config['name'],
+                'provider': agent_config['provider'],
+                'content': self._get_fallback_response(agent_type),
+                'cost': agent_config['cost_per_call'],
+                'timestamp': time.time(),
+                'error': str(e)
+            }
+    
     async def generate_multi_agent_responses(self, business: Dict, audience: Dict, mission: str, selected_agents: List[str] = None) -> Dict:
         """
         Generate responses from selected AI agents using different providers
@@ -313,57 +362,16 @@ Generate a persuasive response that helps achieve the mission objective."""
         """
         if selected_agents is None:
             selected_agents = list(self.agents.keys())
+        agent_types = [agent_type for agent_type in selected_agents if agent_type in self.agents]
         
-        responses = {}
-        total_cost = 0.0
-        
-        # Process each selected agent with their designated AI provider
-        for agent_type in selected_agents:
-            if agent_type not in self.agents:
-                continue
-                
-            agent_config = self.agents[agent_type]
-            
-            try:
-                # Generate system prompt
-                system_prompt = self.generate_system_prompt(agent_type, business, audience, mission)
-                
-                # Call appropriate AI provider
-                if agent_config['provider'].startswith('OpenAI'):
-                    content, cost = await self.call_openai(system_prompt, agent_type)
-                elif agent_config['provider'].startswith('Google'):
-                    content, cost = await self.call_gemini(system_prompt, agent_type)
-                elif agent_config['provider'].startswith('Claude'):
-                    content, cost = await self.call_claude(system_prompt, agent_type)
-                elif agent_config['provider'].startswith('Perplexity'):
-                    content, cost = await self.call_perplexity(system_prompt, agent_type)
-                else:
-                    content, cost = self._get_fallback_response(agent_type), agent_config['cost_per_call']
-                
-                responses[agent_type] = {
-                    'agent_name': agent_config['name'],
-                    'provider': agent_config['provider'],
-                    'content': content,
-                    'cost': cost,
-                    'timestamp': time.time()
-                }
-                
-                total_cost += cost
-                
-                # Small delay between API calls to avoid rate limits
-                time.sleep(0.5)
-                
-            except Exception as e:
-                logger.error(f"Error generating response for {agent_type}: {str(e)}")
-                responses[agent_type] = {
-                    'agent_name': agent_config['name'],
-                    'provider': agent_config['provider'],
-                    'content': self._get_fallback_response(agent_type),
-                    'cost': agent_config['cost_per_call'],
-                    'timestamp': time.time(),
-                    'error': str(e)
-                }
-                total_cost += agent_config['cost_per_call']
+        # Call every agent's provider concurrently; total latency is the slowest call
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(_ai_pool, self._generate_agent_response, agent_type, business, audience, mission)
+            for agent_type in agent_types
+        ))
+        responses = dict(zip(agent_types, results))
+        total_cost = sum(response['cost'] for response in responses.values())
         
         return {
             'responses': responses,
@@ -0,0 +1,40 @@
+from flask import request
+
+# Keyset pagination for list endpoints: ?limit=N&cursor=<last id of the previous page>
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def page_params():
+    """Return (limit, cursor) from the query string
+
+    limit is clamped to 1..MAX_PAGE_SIZE; cursor is None on the first page.
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE)), request.args.get('cursor') or None
+
+def paginate(stmt, id_column, limit, cursor):
+    """Order stmt by id_column and restrict it to the page that starts after cursor"""
+    if cursor is not None:
+        stmt = stmt.where(id_column > cursor)
+    return stmt.order_by(id_column).limit(limit)
+
+class CursorPage:
+    """Iterate one page of row dicts, remembering where the next page starts"""
+
+    def __init__(self, items, key, limit):
+        self._items = items
+        self._key = key
+        self._limit = limit
+        self.count = 0
+        self._last = None
+
+    def __iter__(self):
+        for item in self._items:
+            self.count += 1
+            self._last = item[self._key]
+            yield item
+
+    @property
+    def next_cursor(self):
+        """Cursor for the following page, or None once a short page shows the rows ran out"""
+        return self._last if self.count == self._limit else None
@@ -1,9 +1,14 @@
 import requests
 import json
 import base64
+import time
 from flask import current_app
 from datetime import datetime, timezone
 
+# OAuth tokens are valid for hours, so reuse them until shortly before they expire
+TOKEN_EXPIRY_MARGIN = 60
+_access_tokens = {}
+
 class PayPalService:
     """PayPal API integration service for handling payments."""
     
@@ -25,6 +30,11 @@ class PayPalService:
         if not self.client_id or not self.client_secret:
             raise ValueError("PayPal credentials not configured")
         
+        cache_key = (self.base_url, self.client_id)
+        cached = _access_tokens.get(cache_key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        
         url = f"{self.base_url}/v1/oauth2/token"
         
         # Encode credentials
@@ -45,6 +55,8 @@ class PayPalService:
             response.raise_for_status()
             
             token_data = response.json()
+            expires_at = time.monotonic() + token_data.get('expires_in', 0) - TOKEN_EXPIRY_MARGIN
+            _access_tokens[cache_key] = (token_data['access_token'], expires_at)
             return token_data['access_token']
             
         except requests.exceptions.RequestException as e:
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from cachetools import TTLCache
+
+# Failed logins allowed per client address and email before /login answers 429.
+# The window restarts with every failure and the count clears on success.
+LOGIN_ATTEMPT_LIMIT = 10
+LOGIN_ATTEMPT_WINDOW = 300
+LOGIN_ATTEMPT_SIZE = 10000
+
+# Failed logins allowed per existing account from any address, so rotating
+# addresses cannot keep guessing one password. The window is fixed from the
+# first failure; later failures do not extend it.
+LOGIN_ACCOUNT_LIMIT = 50
+LOGIN_ACCOUNT_WINDOW = 300
+LOGIN_ACCOUNT_SIZE = 10000
+
+_failed_logins = TTLCache(maxsize=LOGIN_ATTEMPT_SIZE, ttl=LOGIN_ATTEMPT_WINDOW)
+# Kept apart from _failed_logins so made-up emails cannot evict account counters
+_account_failures = TTLCache(maxsize=LOGIN_ACCOUNT_SIZE, ttl=LOGIN_ACCOUNT_WINDOW)
+_failed_lock = threading.Lock()
+
+def login_blocked(key):
+    """True once key has used up its failed login attempts"""
+    with _failed_lock:
+        return _failed_logins.get(key, 0) >= LOGIN_ATTEMPT_LIMIT
+
+def record_failed_login(key):
+    """Count a failed login for key"""
+    with _failed_lock:
+        _failed_logins[key] = _failed_logins.get(key, 0) + 1
+
+def clear_failed_logins(key):
+    """Forget failed logins for key after it signs in"""
+    with _failed_lock:
+        _failed_logins.pop(key, None)
+
+def _account_window(email, now):
+    """(failures, window start) for email's current window, or None once it has ended"""
+    entry = _account_failures.get(email)
+    if entry is None or now - entry[1] >= LOGIN_ACCOUNT_WINDOW:
+        return None
+    return entry
+
+def account_locked(email):
+    """True once the account behind email has used up this window's failed logins"""
+    with _failed_lock:
+        entry = _account_window(email, time.monotonic())
+    return entry is not None and entry[0] >= LOGIN_ACCOUNT_LIMIT
+
+def record_account_failure(email):
+    """Count a failed login against an existing account, opening a window if none is running"""
+    now = time.monotonic()
+    with _failed_lock:
+        entry = _account_window(email, now)
+        count, started = entry if entry is not None else (0, now)
+        _account_failures[email] = (count + 1, started)
+
+def clear_account_failures(email):
+    """Forget an account's failed logins after it signs in"""
+    with _failed_lock:
+        _account_failures.pop(email, None)
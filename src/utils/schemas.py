@@ -0,0 +1,82 @@
+import uuid
+from typing import Union
+
+import msgspec
+from flask import request
+from msgspec import UNSET, UnsetType
+
+# Request bodies for the business type and audience write endpoints. msgspec
+# parses the raw body and checks field types in one native pass; handlers keep
+# their own emptiness checks so the error messages stay the same.
+
+class _StrippedBody(msgspec.Struct):
+    """Base for request bodies whose string fields are trimmed on decode"""
+
+    def __post_init__(self):
+        for field in self.__struct_fields__:
+            value = getattr(self, field)
+            if isinstance(value, str):
+                setattr(self, field, value.strip())
+
+class BusinessIn(_StrippedBody):
+    name: str = ''
+    description: str = ''
+    industry_category: str = ''
+
+class BusinessUpdate(_StrippedBody):
+    name: Union[str, UnsetType] = UNSET
+    description: Union[str, UnsetType] = UNSET
+    industry_category: Union[str, UnsetType] = UNSET
+
+class AudienceIn(_StrippedBody):
+    name: str = ''
+    description: str = ''
+
+class ManualAudienceIn(_StrippedBody):
+    name: str = ''
+    manual_description: str = ''
+
+class AudienceUpdate(_StrippedBody):
+    name: Union[str, UnsetType] = UNSET
+    description: Union[str, UnsetType] = UNSET
+    manual_description: Union[str, UnsetType] = UNSET
+
+# These bodies are a few short strings; larger ones are rejected without being read
+MAX_BODY_BYTES = 8192
+
+def decode_body(schema):
+    """Decode the raw request body as schema, skipping request.get_json()
+
+    Returns (body, None, None), or (None, message, status) when the body is
+    empty (400), over MAX_BODY_BYTES (413), is not JSON or does not match the
+    schema (400). A Content-Length over the limit is rejected before anything
+    is read; chunked bodies without one are read up to one byte past it.
+    """
+    length = request.content_length
+    if length is None:
+        data = request.stream.read(MAX_BODY_BYTES + 1)
+    elif length > MAX_BODY_BYTES:
+        data = None
+    else:
+        data = request.get_data(cache=False)
+    if data is None or len(data) > MAX_BODY_BYTES:
+        return None, 'Request body is too large', 413
+    if not data:
+        return None, 'No data provided', 400
+    try:
+        return msgspec.json.decode(data, type=schema), None, None
+    except msgspec.ValidationError as e:
+        return None, f'Invalid data: {e}', 400
+    except msgspec.DecodeError:
+        return None, 'Request body is not valid JSON', 400
+
+def parse_uuid(value):
+    """Canonical string form of a UUID path segment, or None if it is not one
+
+    Views take ids as plain strings and check them here, so a malformed id
+    gets their JSON 404 rather than falling through to the SPA catch-all.
+    """
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
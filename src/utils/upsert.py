@@ -0,0 +1,16 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+def insert_or_skip(session, model, values, returning):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING in a single round-trip
+
+    Returns the first returned row, or None when a unique constraint already
+    holds a matching row. returning may list columns or the mapped class itself.
+    """
+    dialect = sqlite if session.get_bind().dialect.name == 'sqlite' else postgresql
+    stmt = (
+        dialect.insert(model)
+        .values(**values)
+        .on_conflict_do_nothing()
+        .returning(*returning)
+    )
+    return session.execute(stmt).first()
@@ -0,0 +1,35 @@
+import threading
+
+from cachetools import TTLCache
+
+# Identity lookups for authenticated requests. Only fields that change through
+# update_profile are cached; balances and timestamps are always read fresh.
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 10000
+
+_users = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_users_lock = threading.Lock()
+
+def get_user_cached(user_model, user_id):
+    """Return {'user_id', 'email'} for user_id, or None if the user does not exist
+
+    user_model is the caller's User class, so both model modules share the cache.
+    """
+    with _users_lock:
+        cached = _users.get(user_id)
+    if cached is not None:
+        return cached
+    
+    row = user_model.query.with_entities(user_model.user_id, user_model.email).filter_by(user_id=user_id).first()
+    if row is None:
+        return None
+    
+    user = {'user_id': row.user_id, 'email': row.email}
+    with _users_lock:
+        _users[user_id] = user
+    return user
+
+def invalidate_user(user_id):
+    """Drop the cached identity for user_id after its profile changes"""
+    with _users_lock:
+        _users.pop(user_id, None)